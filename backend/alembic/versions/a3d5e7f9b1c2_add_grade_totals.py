@@ -0,0 +1,53 @@
+"""Add grade_totals rollup
+
+Revision ID: a3d5e7f9b1c2
+Revises: f1ec4cab30de
+Create Date: 2026-10-17 14:05:12.118204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a3d5e7f9b1c2'
+down_revision: Union[str, Sequence[str], None] = 'f1ec4cab30de'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('grade_totals',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('student_id', sa.Integer(), nullable=True),
+    sa.Column('subject_id', sa.Integer(), nullable=True),
+    sa.Column('month', sa.Date(), nullable=True),
+    sa.Column('total', sa.Integer(), nullable=True),
+    sa.Column('count', sa.Integer(), nullable=True),
+    sa.ForeignKeyConstraint(['student_id'], ['students.id'], ),
+    sa.ForeignKeyConstraint(['subject_id'], ['subjects.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_grade_totals_id'), 'grade_totals', ['id'], unique=False)
+    op.create_index('uq_grade_totals_student_subject_month', 'grade_totals', ['student_id', 'subject_id', 'month'], unique=True)
+
+    # Заполняем из уже существующих оценок
+    if op.get_bind().dialect.name == 'postgresql':
+        month = "CAST(date_trunc('month', date) AS date)"
+    else:
+        month = "date(date, 'start of month')"
+    op.execute(
+        f"INSERT INTO grade_totals (student_id, subject_id, month, total, count) "
+        f"SELECT student_id, subject_id, {month}, SUM(value), COUNT(id) FROM grades "
+        f"GROUP BY student_id, subject_id, {month}"
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('uq_grade_totals_student_subject_month', table_name='grade_totals')
+    op.drop_index(op.f('ix_grade_totals_id'), table_name='grade_totals')
+    op.drop_table('grade_totals')
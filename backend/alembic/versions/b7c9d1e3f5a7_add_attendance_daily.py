@@ -0,0 +1,53 @@
+"""Add attendance_daily rollup
+
+Revision ID: b7c9d1e3f5a7
+Revises: a3d5e7f9b1c2
+Create Date: 2026-10-17 15:20:44.902113
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b7c9d1e3f5a7'
+down_revision: Union[str, Sequence[str], None] = 'a3d5e7f9b1c2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('attendance_daily',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('class_group_id', sa.Integer(), nullable=True),
+    sa.Column('date', sa.Date(), nullable=True),
+    sa.Column('present', sa.Integer(), nullable=True),
+    sa.Column('absent', sa.Integer(), nullable=True),
+    sa.Column('late', sa.Integer(), nullable=True),
+    sa.ForeignKeyConstraint(['class_group_id'], ['class_groups.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_attendance_daily_id'), 'attendance_daily', ['id'], unique=False)
+    op.create_index('uq_attendance_daily_class_date', 'attendance_daily', ['class_group_id', 'date'], unique=True)
+
+    # Заполняем из уже существующих отметок (класс - текущий класс ученика)
+    op.execute(
+        "INSERT INTO attendance_daily (class_group_id, date, present, absent, late) "
+        "SELECT s.class_group_id, a.date, "
+        "SUM(CASE WHEN a.status = 'PRESENT' THEN 1 ELSE 0 END), "
+        "SUM(CASE WHEN a.status = 'ABSENT' THEN 1 ELSE 0 END), "
+        "SUM(CASE WHEN a.status = 'LATE' THEN 1 ELSE 0 END) "
+        "FROM attendance a JOIN students s ON s.id = a.student_id "
+        "WHERE s.class_group_id IS NOT NULL AND a.status IN ('PRESENT', 'ABSENT', 'LATE') "
+        "GROUP BY s.class_group_id, a.date"
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('uq_attendance_daily_class_date', table_name='attendance_daily')
+    op.drop_index(op.f('ix_attendance_daily_id'), table_name='attendance_daily')
+    op.drop_table('attendance_daily')
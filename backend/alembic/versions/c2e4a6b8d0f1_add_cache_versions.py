@@ -0,0 +1,32 @@
+"""Add cache_versions
+
+Revision ID: c2e4a6b8d0f1
+Revises: b7c9d1e3f5a7
+Create Date: 2026-10-17 16:41:09.553871
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c2e4a6b8d0f1'
+down_revision: Union[str, Sequence[str], None] = 'b7c9d1e3f5a7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('cache_versions',
+    sa.Column('name', sa.String(), nullable=False),
+    sa.Column('version', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('name')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('cache_versions')
@@ -0,0 +1,37 @@
+"""Add trigram index on student names (Postgres)
+
+Revision ID: d4f6b8a0c2e3
+Revises: c2e4a6b8d0f1
+Create Date: 2026-10-17 18:05:12.417309
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd4f6b8a0c2e3'
+down_revision: Union[str, Sequence[str], None] = 'c2e4a6b8d0f1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Только Postgres. На SQLite поиск идет по триграммному индексу в памяти (services/student_search.py)
+    if op.get_bind().dialect.name != "postgresql":
+        return
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    # Выражение должно совпадать с тем, что в запросе поиска: replace(lower(full_name), 'ё', 'е')
+    op.execute(
+        "CREATE INDEX IF NOT EXISTS ix_students_full_name_trgm ON students "
+        "USING gin (replace(lower(full_name), 'ё', 'е') gin_trgm_ops)"
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    if op.get_bind().dialect.name != "postgresql":
+        return
+    op.execute("DROP INDEX IF EXISTS ix_students_full_name_trgm")
@@ -0,0 +1,28 @@
+"""Add (date, id) index on grades for extracts
+
+Revision ID: e5a7c9b1d3f4
+Revises: d4f6b8a0c2e3
+Create Date: 2026-10-17 22:31:47.905112
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e5a7c9b1d3f4'
+down_revision: Union[str, Sequence[str], None] = 'd4f6b8a0c2e3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Выгрузка оценок идет по диапазону дат в порядке (date, id): индекс отдает строки уже упорядоченными
+    op.create_index('ix_grades_date_id', 'grades', ['date', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_grades_date_id', table_name='grades')
@@ -0,0 +1,68 @@
+"""Add composite indexes and unique keys
+
+Revision ID: f1ec4cab30de
+Revises: 7499ad797df3
+Create Date: 2026-10-17 10:12:31.402118
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f1ec4cab30de'
+down_revision: Union[str, Sequence[str], None] = '7499ad797df3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Дубликаты мешают создать уникальные индексы: оставляем самую свежую запись (max id)
+DEDUPLICATE = {
+    'grades': 'student_id, subject_id, date',
+    'attendance': 'student_id, date',
+    'final_grades': 'student_id, subject_id, period_name',
+}
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Таблица final_grades раньше создавалась только через create_all
+    if not sa.inspect(op.get_bind()).has_table('final_grades'):
+        op.create_table('final_grades',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('period_name', sa.String(), nullable=True),
+        sa.Column('value', sa.Integer(), nullable=True),
+        sa.Column('student_id', sa.Integer(), nullable=True),
+        sa.Column('subject_id', sa.Integer(), nullable=True),
+        sa.ForeignKeyConstraint(['student_id'], ['students.id'], ),
+        sa.ForeignKeyConstraint(['subject_id'], ['subjects.id'], ),
+        sa.PrimaryKeyConstraint('id')
+        )
+        op.create_index(op.f('ix_final_grades_id'), 'final_grades', ['id'], unique=False)
+
+    for table, columns in DEDUPLICATE.items():
+        op.execute(
+            f"DELETE FROM {table} WHERE id NOT IN "
+            f"(SELECT MAX(id) FROM {table} GROUP BY {columns})"
+        )
+
+    op.create_index('uq_grades_student_subject_date', 'grades', ['student_id', 'subject_id', 'date'], unique=True)
+    op.create_index('uq_attendance_student_date', 'attendance', ['student_id', 'date'], unique=True)
+    op.create_index('uq_final_grades_student_subject_period', 'final_grades', ['student_id', 'subject_id', 'period_name'], unique=True)
+    op.create_index(op.f('ix_students_class_group_id'), 'students', ['class_group_id'], unique=False)
+    op.create_index('ix_schedules_day_teacher_start', 'schedules', ['day_of_week', 'teacher_id', 'start_time'], unique=False)
+    op.create_index('ix_schedules_day_room_start', 'schedules', ['day_of_week', 'room_number', 'start_time'], unique=False)
+    op.create_index('ix_schedules_day_class_start', 'schedules', ['day_of_week', 'class_group_id', 'start_time'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_schedules_day_class_start', table_name='schedules')
+    op.drop_index('ix_schedules_day_room_start', table_name='schedules')
+    op.drop_index('ix_schedules_day_teacher_start', table_name='schedules')
+    op.drop_index(op.f('ix_students_class_group_id'), table_name='students')
+    op.drop_index('uq_final_grades_student_subject_period', table_name='final_grades')
+    op.drop_index('uq_attendance_student_date', table_name='attendance')
+    op.drop_index('uq_grades_student_subject_date', table_name='grades')
@@ -1,13 +1,17 @@
 from datetime import datetime, date
 from typing import Annotated
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Response
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 
 from app.db.session import get_db
+from app.db.replica import get_read_db
+from app.db.upsert import upsert_with_previous
 from app.models.school import Attendance, Student, Schedule # Добавили Schedule
-from app.schemas.school import AttendanceCreate, AttendanceResponse
+from app.schemas.school import AttendanceCreate, AttendanceResponse, AttendanceBulkCreate
 from app.api.deps import get_current_user, allow_teacher
+from app.api.pagination import PageParams, paginate
+from app.services.attendance_daily import apply_attendance_changes
 
 router = APIRouter()
 
@@ -16,6 +20,45 @@ DAYS_MAPPING = {
     4: "Пятница", 5: "Суббота", 6: "Воскресенье"
 }
 
+async def check_lesson_window(db: AsyncSession, current_user, class_id: int, attendance_date: date):
+    """
+    Учитель может отмечать только сегодня и только после начала своего урока
+    с этим классом. Админ - без ограничений.
+    """
+    if current_user.role != "TEACHER":
+        return
+
+    today_date = datetime.now().date()
+
+    # Только сегодня
+    if attendance_date != today_date:
+        raise HTTPException(status_code=400, detail="Отмечать посещаемость можно только день в день")
+
+    # Ищем урок в расписании, чтобы узнать время начала
+    # Attendance не привязан к предмету напрямую в БД,
+    # но логически мы отмечаем на уроке.
+    # Упрощение: Проверяем, есть ли ХОТЬ ОДИН урок у этого учителя с этим классом сейчас.
+    now = datetime.now()
+    current_day_name = DAYS_MAPPING[now.weekday()]
+    current_time_str = now.strftime("%H:%M")
+
+    # Ищем любой урок этого учителя у этого класса на сегодня
+    query = select(Schedule.start_time).filter(
+        Schedule.class_group_id == class_id,
+        Schedule.teacher_id == current_user.id,
+        Schedule.day_of_week == current_day_name
+    )
+    result = await db.execute(query)
+    start_times = result.scalars().all()
+
+    if not start_times:
+        raise HTTPException(status_code=403, detail="У вас нет уроков с этим классом сегодня")
+
+    # Проверяем, начался ли хоть один из этих уроков
+    # (Если уроков несколько подряд, разрешаем с начала первого)
+    if not any(current_time_str >= start_time for start_time in start_times):
+        raise HTTPException(status_code=400, detail="Урок еще не начался, отмечать нельзя")
+
 @router.post("/", response_model=AttendanceResponse)
 async def mark_attendance(
     attendance_in: AttendanceCreate,
@@ -28,80 +71,87 @@ async def mark_attendance(
         raise HTTPException(status_code=404, detail="Student not found")
 
     # 2. ПРОВЕРКА ВРЕМЕНИ (Если это учитель)
-    if current_user.role == "TEACHER":
-        today_date = datetime.now().date()
-        
-        # Только сегодня
-        if attendance_in.date != today_date:
-            raise HTTPException(status_code=400, detail="Отмечать посещаемость можно только день в день")
-
-        # Ищем урок в расписании, чтобы узнать время начала
-        # Нам нужно узнать предмет? Attendance не привязан к предмету напрямую в БД, 
-        # но логически мы отмечаем на уроке. 
-        # Упрощение: Проверяем, есть ли ХОТЬ ОДИН урок у этого учителя с этим классом сейчас.
-        
-        now = datetime.now()
-        current_day_name = DAYS_MAPPING[now.weekday()]
-        current_time_str = now.strftime("%H:%M")
-
-        # Ищем любой урок этого учителя у этого класса на сегодня
-        query = select(Schedule).filter(
-            Schedule.class_group_id == student.class_group_id,
-            Schedule.teacher_id == current_user.id,
-            Schedule.day_of_week == current_day_name
-        )
-        result = await db.execute(query)
-        lessons = result.scalars().all()
-
-        if not lessons:
-             raise HTTPException(status_code=403, detail="У вас нет уроков с этим классом сегодня")
-
-        # Проверяем, начался ли хоть один из этих уроков
-        # (Если уроков несколько подряд, разрешаем с начала первого)
-        lesson_started = False
-        for lesson in lessons:
-            if current_time_str >= lesson.start_time:
-                lesson_started = True
-                break
-        
-        if not lesson_started:
-            raise HTTPException(status_code=400, detail="Урок еще не начался, отмечать нельзя")
-
-
-    # 3. Логика сохранения (без изменений)
-    query = select(Attendance).filter(
-        Attendance.student_id == attendance_in.student_id,
-        Attendance.date == attendance_in.date
+    await check_lesson_window(db, current_user, student.class_group_id, attendance_in.date)
+
+    # 3. Сохранение: одна отметка на ученика в день; заодно узнаем старый статус (для attendance_daily)
+    key = (attendance_in.student_id, attendance_in.date)
+    previous = await upsert_with_previous(
+        db, Attendance,
+        [{"student_id": attendance_in.student_id, "date": attendance_in.date, "status": attendance_in.status}],
+        conflict_columns=["student_id", "date"], update_columns=["status"], track_column="status"
     )
-    result = await db.execute(query)
-    existing_record = result.scalars().first()
-
-    if existing_record:
-        existing_record.status = attendance_in.status
-        await db.commit()
-        await db.refresh(existing_record)
-        return existing_record
-
-    new_attendance = Attendance(
-        student_id=attendance_in.student_id,
-        date=attendance_in.date,
-        status=attendance_in.status
+    await apply_attendance_changes(db, [
+        (student.class_group_id, attendance_in.date, previous.get(key), attendance_in.status)
+    ])
+    res = await db.execute(select(Attendance).filter(Attendance.student_id == key[0], Attendance.date == key[1]))
+    record = res.scalar_one()
+    await db.commit()
+    return record
+
+# --- МАССОВАЯ ОТМЕТКА (ВЕСЬ КЛАСС) ---
+@router.post("/bulk", response_model=list[AttendanceResponse])
+async def mark_attendance_bulk(
+    data: AttendanceBulkCreate,
+    db: Annotated[AsyncSession, Depends(get_db)],
+    current_user = Depends(allow_teacher)
+):
+    """
+    Отметить посещаемость всего класса за один запрос.
+    Время урока проверяется один раз, все записи пишутся одним upsert-запросом.
+    """
+    # Если ученик указан дважды - берем последний статус
+    statuses = {item.student_id: item.status for item in data.items}
+    if not statuses:
+        return []
+
+    # 1. Все ученики должны быть из этого класса (один запрос)
+    res_st = await db.execute(
+        select(Student.id).filter(Student.id.in_(statuses.keys()), Student.class_group_id == data.class_id)
+    )
+    found_ids = set(res_st.scalars().all())
+    missing = sorted(set(statuses) - found_ids)
+    if missing:
+        raise HTTPException(status_code=404, detail=f"Ученики не найдены в этом классе: {missing}")
+
+    # 2. Проверка времени урока - один раз на весь класс
+    await check_lesson_window(db, current_user, data.class_id, data.date)
+
+    # 3. Все отметки сразу (upsert), заодно - старые статусы за этот день (для сводки attendance_daily)
+    rows = [
+        {"student_id": student_id, "date": data.date, "status": status, "teacher_id": current_user.id}
+        for student_id, status in statuses.items()
+    ]
+    previous = await upsert_with_previous(
+        db, Attendance, rows,
+        conflict_columns=["student_id", "date"], update_columns=["status", "teacher_id"], track_column="status"
     )
-    db.add(new_attendance)
+    await apply_attendance_changes(db, [
+        (data.class_id, data.date, previous.get((student_id, data.date)), status)
+        for student_id, status in statuses.items()
+    ])
+    res = await db.execute(
+        select(Attendance).filter(Attendance.student_id.in_(statuses.keys()), Attendance.date == data.date)
+    )
+    by_student = {record.student_id: record for record in res.scalars()}
     await db.commit()
-    await db.refresh(new_attendance)
-    return new_attendance
+    return [by_student[student_id] for student_id in statuses] # В порядке запроса
 
 @router.get("/", response_model=list[AttendanceResponse])
 async def get_attendance(
-    db: Annotated[AsyncSession, Depends(get_db)],
+    response: Response,
+    db: Annotated[AsyncSession, Depends(get_read_db)],
+    page: Annotated[PageParams, Depends()],
     _ = Depends(get_current_user),
     class_id: int | None = None,
-    check_date: date | None = None
+    check_date: date | None = None,
+    student_id: int | None = None,
+    date_from: date | None = None,
+    date_to: date | None = None,
+    status: str | None = None
 ):
     """
-    Получить список посещаемости.
-    Можно фильтровать по классу и дате.
+    Получить список посещаемости (постранично, по дате).
+    Можно фильтровать по классу, ученику, дню или периоду и статусу.
     """
     query = select(Attendance)
 
@@ -109,10 +159,17 @@ async def get_attendance(
     # так как в таблице посещаемости нет class_id, он есть только у ученика
     if class_id:
         query = query.join(Student).filter(Student.class_group_id == class_id)
-    
+    if student_id:
+        query = query.filter(Attendance.student_id == student_id)
+
     # Фильтр по дате
     if check_date:
         query = query.filter(Attendance.date == check_date)
-
-    result = await db.execute(query)
-    return result.scalars().all()
\ No newline at end of file
+    if date_from:
+        query = query.filter(Attendance.date >= date_from)
+    if date_to:
+        query = query.filter(Attendance.date <= date_to)
+    if status:
+        query = query.filter(Attendance.status == status)
+
+    return await paginate(db, query, [Attendance.date, Attendance.id], page, response)
\ No newline at end of file
@@ -1,46 +1,25 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Request, Response, Form
+from fastapi import APIRouter, Depends, HTTPException, status, Response, Form
 from fastapi.responses import JSONResponse
 from fastapi.security import OAuth2PasswordRequestForm
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, delete
 from app.db.session import get_db
+from app.db.replica import get_read_db
 from app.models.user import User
-from app.core.security import verify_password, get_password_hash, create_access_token
+from app.core.security import verify_password_async, get_password_hash_async, create_access_token, password_hasher
 from app.core.config import settings
+from app.api.deps import get_optional_user, invalidate_principal
+from app.api.pagination import PageParams, paginate
+from app.schemas.user import UserUpdate
+from app.services.timetable import timetable_cache
 from datetime import timedelta
+from typing import Annotated
 
 router = APIRouter(prefix="/auth", tags=["auth"])
 
 # --- ПОЛУЧЕНИЕ ТЕКУЩЕГО ПОЛЬЗОВАТЕЛЯ ---
-async def get_current_user_from_cookie(request: Request, db: AsyncSession = Depends(get_db)):
-    # 1. Сначала ищем в заголовке (для Fetch/AJAX запросов с дашборда)
-    auth_header = request.headers.get("Authorization")
-    token = None
-    
-    if auth_header and auth_header.startswith("Bearer "):
-        token = auth_header.split(" ")[1]
-    
-    # 2. Если нет в заголовке, ищем в куках (резерв)
-    if not token:
-        token = request.cookies.get("access_token")
-        if token and token.startswith("Bearer "):
-            token = token.split(" ")[1]
-
-    if not token:
-        return None
-
-    from jose import jwt, JWTError
-    try:
-        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
-        email: str = payload.get("sub")
-        if email is None:
-            return None
-    except JWTError:
-        return None
-
-    result = await db.execute(select(User).filter(User.email == email))
-    user = result.scalars().first()
-    return user
+# Один общий путь авторизации (заголовок или кука + кэш), см. app/api/deps.py
+get_current_user_from_cookie = get_optional_user
 
 # --- РЕГИСТРАЦИЯ ---
 @router.post("/register")
@@ -62,7 +41,7 @@ async def register(
 
     new_user = User(
         email=email,
-        hashed_password=get_password_hash(password),
+        hashed_password=await get_password_hash_async(password),
         role=final_role,
         is_active=True # Сразу активен
     )
@@ -83,7 +62,7 @@ async def login(
     result = await db.execute(select(User).filter(User.email == form_data.username))
     user = result.scalars().first()
 
-    if not user or not verify_password(form_data.password, user.hashed_password):
+    if not user or not await verify_password_async(form_data.password, user.hashed_password):
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Неверный email или пароль")
 
     # Создаем токен
@@ -119,13 +98,18 @@ async def read_users_me(current_user: User = Depends(get_current_user_from_cooki
 # --- СПИСОК ПОЛЬЗОВАТЕЛЕЙ (Админ) ---
 @router.get("/users")
 async def get_all_users(
-    db: AsyncSession = Depends(get_db),
-    current_user: User = Depends(get_current_user_from_cookie)
+    response: Response,
+    page: Annotated[PageParams, Depends()],
+    db: AsyncSession = Depends(get_read_db),
+    current_user: User = Depends(get_current_user_from_cookie),
+    role: str | None = None
 ):
     if not current_user or current_user.role != "ADMIN":
          raise HTTPException(status_code=403, detail="Not authorized")
-    result = await db.execute(select(User).order_by(User.id))
-    return result.scalars().all()
+    query = select(User)
+    if role:
+        query = query.filter(User.role == role.upper())
+    return await paginate(db, query, [User.id], page, response)
 
 # --- УДАЛЕНИЕ ---
 @router.post("/delete/{user_id}")
@@ -141,4 +125,45 @@ async def delete_user(
 
     await db.execute(delete(User).where(User.id == user_id))
     await db.commit()
-    return {"msg": "Deleted"}
\ No newline at end of file
+    await invalidate_principal(db)
+    await timetable_cache.bump(db) # В сетке показывается email учителя
+    return {"msg": "Deleted"}
+
+# --- РЕДАКТИРОВАНИЕ (роль, email, пароль, активность) ---
+@router.put("/users/{user_id}")
+async def update_user(
+    user_id: int,
+    data: UserUpdate,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user_from_cookie)
+):
+    if not current_user or current_user.role != "ADMIN":
+        raise HTTPException(status_code=403, detail="Forbidden")
+    user = await db.get(User, user_id)
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+
+    if data.email and data.email != user.email:
+        result = await db.execute(select(User).filter(User.email == data.email))
+        if result.scalars().first():
+            raise HTTPException(status_code=400, detail="Email already registered")
+        user.email = data.email
+    if data.password:
+        user.hashed_password = await get_password_hash_async(data.password)
+    if data.role:
+        user.role = data.role.upper()
+    if data.is_active is not None:
+        user.is_active = data.is_active
+
+    await db.commit()
+    # Старые данные пользователя больше не должны отдаваться из кэша
+    await invalidate_principal(db)
+    await timetable_cache.bump(db)
+    return {"msg": "Updated"}
+
+# --- СТАТИСТИКА ПУЛА ХЕШИРОВАНИЯ (Админ) ---
+@router.get("/hasher/stats")
+async def get_hasher_stats(current_user: User = Depends(get_current_user_from_cookie)):
+    if not current_user or current_user.role != "ADMIN":
+        raise HTTPException(status_code=403, detail="Not authorized")
+    return password_hasher.stats()
@@ -0,0 +1,41 @@
+from typing import Any, Awaitable, Callable, Hashable
+from fastapi import Request, Response
+from fastapi.responses import JSONResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.cache import etag_matches
+from app.services.cache_versions import SharedVersionedCache
+
+async def cached_json_response(
+    request: Request,
+    db: AsyncSession,
+    cache: SharedVersionedCache,
+    key: Hashable,
+    load: Callable[[], Awaitable[tuple[Any, dict]]]
+) -> Response:
+    """
+    Ответ из кэша с ETag.
+    1. If-None-Match совпал с текущей версией -> 304 (без запроса данных).
+    2. Снимок есть в памяти воркера -> отдаем его.
+    3. Иначе load() -> (JSON-данные, доп. заголовки), кладем в кэш.
+    """
+    await cache.sync(db)
+    etag = cache.etag(key)
+    if etag_matches(request.headers.get("If-None-Match"), etag):
+        return Response(status_code=304, headers={"ETag": etag})
+
+    content, headers = await cached_snapshot(cache, key, load)
+    return JSONResponse(content=content, headers={**headers, "ETag": etag, "Cache-Control": "no-cache"})
+
+async def cached_snapshot(cache: SharedVersionedCache, key: Hashable, load: Callable[[], Awaitable[tuple[Any, dict]]]):
+    """
+    (данные, заголовки) из памяти воркера или load(). Версию сверяет вызывающий (cache.sync).
+    Те же ключи, что у отдельных эндпоинтов, - снимки общие (см. /dashboard/bootstrap).
+    Если во время load() версия сменилась (другой запрос увидел bump), снимок отдаем, но не кэшируем.
+    """
+    cached = cache.get(key)
+    if cached is None:
+        version = cache.version
+        cached = await load()
+        cache.set(key, cached, version)
+    return cached
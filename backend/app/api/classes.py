@@ -1,5 +1,5 @@
 from typing import Annotated
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 
@@ -7,6 +7,9 @@ from app.db.session import get_db
 from app.models.school import ClassGroup
 from app.schemas.school import ClassGroupCreate, ClassGroupResponse
 from app.api.deps import allow_admin, get_current_user
+from app.api.pagination import PageParams, paginate
+from app.api.caching import cached_json_response
+from app.services.cache_versions import reference_cache
 
 router = APIRouter()
 
@@ -29,15 +32,34 @@ async def create_class(
     db.add(new_class)
     await db.commit()
     await db.refresh(new_class)
+    await reference_cache.bump(db)
     return new_class
 
+async def load_classes(db: AsyncSession, page: PageParams):
+    response = Response()
+    items = await paginate(db, select(ClassGroup), [ClassGroup.name, ClassGroup.id], page, response)
+    data = [ClassGroupResponse.model_validate(item).model_dump(mode="json") for item in items]
+    return data, {k: v for k, v in response.headers.items() if k.startswith("x-")}
+
+async def load_all_classes(db: AsyncSession):
+    """Весь справочник классов одним списком (для выпадающих списков панели, без страниц)."""
+    res = await db.execute(select(ClassGroup).order_by(ClassGroup.name, ClassGroup.id))
+    return [ClassGroupResponse.model_validate(item).model_dump(mode="json") for item in res.scalars()], {}
+
+def classes_cache_key(page: PageParams) -> tuple:
+    return ("classes", page.cursor, page.limit, page.include_total)
+
 @router.get("/", response_model=list[ClassGroupResponse])
 async def read_classes(
+    request: Request,
     db: Annotated[AsyncSession, Depends(get_db)],
+    page: Annotated[PageParams, Depends()],
     _ = Depends(get_current_user) # <--- Любой авторизованный пользователь
 ):
     """
-    Получить список всех классов.
+    Получить список всех классов (постранично, по названию).
+    Ответ кэшируется (справочник) и отдается с ETag.
     """
-    result = await db.execute(select(ClassGroup))
-    return result.scalars().all()
\ No newline at end of file
+    return await cached_json_response(
+        request, db, reference_cache, classes_cache_key(page), lambda: load_classes(db, page)
+    )
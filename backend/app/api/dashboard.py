@@ -0,0 +1,52 @@
+from typing import Annotated
+from fastapi import APIRouter, Depends
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from app.db.session import get_db
+from app.models.user import User
+from app.api.deps import get_current_user
+from app.api.caching import cached_snapshot
+from app.api.classes import load_all_classes
+from app.api.settings import load_bells, load_subjects
+from app.api.schedule import load_schedule
+from app.services.cache_versions import reference_cache
+from app.services.timetable import timetable_cache
+
+router = APIRouter()
+
+# --- СТАРТОВЫЕ ДАННЫЕ ПАНЕЛИ (ОДИН ЗАПРОС ВМЕСТО ШЕСТИ) ---
+@router.get("/bootstrap")
+async def get_dashboard_bootstrap(
+    db: Annotated[AsyncSession, Depends(get_db)],
+    current_user: User = Depends(get_current_user),
+    schedule: bool = True,  # Уроки (false - только справочники, например после правки настроек)
+    day: str | None = None  # День недели для "Сегодня" (считает браузер - у него часовой пояс пользователя)
+):
+    """
+    Все, что нужно dashboard.html при загрузке, по роли пользователя:
+    пользователь, звонки, классы (все, без страниц), предметы; админу - учителя, остальным - уроки (учителю - свои).
+    Одна авторизация и одна сессия БД (та же, что у авторизации). Справочники и сетка
+    берутся из тех же снимков в памяти, что и /classes/, /settings/*, /schedule/.
+    """
+    data = {"user": {"id": current_user.id, "email": current_user.email, "role": current_user.role}}
+    if current_user.role == "GUEST":
+        return data
+
+    await reference_cache.sync(db)
+    data["bells"], _ = await cached_snapshot(reference_cache, ("bells",), lambda: load_bells(db))
+    # Классы - целиком, а не первая страница /classes/: выпадающий список не должен обрезаться
+    data["classes"], _ = await cached_snapshot(reference_cache, ("classes", "all"), lambda: load_all_classes(db))
+    data["subjects"], _ = await cached_snapshot(reference_cache, ("subjects",), lambda: load_subjects(db))
+
+    if current_user.role == "ADMIN":
+        res = await db.execute(select(User.id, User.email).filter(User.role == "TEACHER").order_by(User.id))
+        data["teachers"] = [{"id": user_id, "email": email} for user_id, email in res]
+    elif schedule:
+        # Как GET /schedule/?day=...: учитель видит только свои уроки
+        await timetable_cache.sync(db)
+        own_teacher_id = current_user.id if current_user.role == "TEACHER" else None
+        cache_key = (own_teacher_id, None, None, day)
+        data["schedule"], _ = await cached_snapshot(timetable_cache, cache_key, lambda: load_schedule(db, *cache_key))
+
+    return data
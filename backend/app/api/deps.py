@@ -1,51 +1,90 @@
 from typing import Annotated
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Request, status
 from fastapi.security import OAuth2PasswordBearer
-from jose import JWTError, jwt
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.core.config import settings
+from app.core.security import decode_access_token
 from app.db.session import get_db
 from app.models.user import User
 from app.schemas.token import TokenData
+from app.services.cache_versions import SharedVersionedCache
 from app.services.user import get_user_by_email
 
 # Указываем FastAPI, где искать URL для входа (чтобы Swagger UI умел авторизовываться)
-oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/login")
+# auto_error=False: если заголовка нет - ищем токен в куке
+oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/login", auto_error=False)
 
-async def get_current_user(
-    token: Annotated[str, Depends(oauth2_scheme)],
+# Кэш активных пользователей: email (sub из токена) -> User (отвязанный от сессии).
+# Версия общая для всех воркеров (cache_versions): удаленный или разжалованный пользователь
+# пропадает из кэша каждого воркера не позже чем через CACHE_VERSION_CHECK_SECONDS
+principal_cache = SharedVersionedCache(
+    "principals", maxsize=settings.AUTH_CACHE_MAX_SIZE, ttl=settings.AUTH_CACHE_TTL_SECONDS
+)
+
+async def invalidate_principal(db: AsyncSession):
+    """Сбросить кэш пользователей на всех воркерах (после удаления, смены роли и т.п.). Вызывать после commit."""
+    await principal_cache.bump(db)
+
+def get_token_from_request(request: Request, token: str | None) -> str | None:
+    # 1. Сначала заголовок Authorization (для Fetch/AJAX запросов с дашборда)
+    if token:
+        return token
+    # 2. Если нет в заголовке, ищем в куках (резерв)
+    token = request.cookies.get("access_token")
+    if token and token.startswith("Bearer "):
+        token = token.split(" ")[1]
+    return token or None
+
+async def get_optional_user(
+    request: Request,
+    token: Annotated[str | None, Depends(oauth2_scheme)],
     db: Annotated[AsyncSession, Depends(get_db)]
-) -> User:
+) -> User | None:
+    """
+    Единая точка авторизации.
+    Возвращает User или None (если токена нет или он невалиден).
+    Пользователь определяется один раз за запрос и кэшируется между запросами.
+    """
+    # 0. Уже определяли в рамках этого запроса
+    if hasattr(request.state, "user"):
+        return request.state.user
+
+    user = None
+    token = get_token_from_request(request, token)
+    if token:
+        # 1. Декодируем токен
+        payload = decode_access_token(token)
+        token_data = TokenData(email=payload.get("sub")) if payload else TokenData()
+
+        if token_data.email:
+            # 2. Сначала кэш, потом БД
+            await principal_cache.sync(db)
+            user = principal_cache.get(token_data.email)
+            if user is None:
+                version = principal_cache.version
+                user = await get_user_by_email(db, email=token_data.email)
+                if user is not None and user.is_active:
+                    db.expunge(user) # Отвязываем от сессии, чтобы безопасно хранить в кэше
+                    principal_cache.set(token_data.email, user, version)
+
+    request.state.user = user
+    return user
+
+async def get_current_user(user: Annotated[User | None, Depends(get_optional_user)]) -> User:
     """
     Эта функция проверяет токен.
     Если токен валиден - возвращает объект User.
     Если нет - выбрасывает ошибку 401.
     """
-    credentials_exception = HTTPException(
-        status_code=status.HTTP_401_UNAUTHORIZED,
-        detail="Could not validate credentials",
-        headers={"WWW-Authenticate": "Bearer"},
-    )
-    try:
-        # 1. Декодируем токен
-        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
-        email: str = payload.get("sub")
-        if email is None:
-            raise credentials_exception
-        token_data = TokenData(email=email)
-    except JWTError:
-        raise credentials_exception
-
-    # 2. Ищем пользователя в БД
-    user = await get_user_by_email(db, email=token_data.email)
     if user is None:
-        raise credentials_exception
-    
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Could not validate credentials",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
     return user
 
-# ... (код который был выше оставляем без изменений) ...
-
 class RoleChecker:
     def __init__(self, allowed_roles: list[str]):
         self.allowed_roles = allowed_roles
@@ -53,11 +92,11 @@ class RoleChecker:
     def __call__(self, user: User = Depends(get_current_user)):
         if user.role not in self.allowed_roles:
             raise HTTPException(
-                status_code=status.HTTP_403_FORBIDDEN, 
+                status_code=status.HTTP_403_FORBIDDEN,
                 detail="Not enough permissions"
             )
         return user
 
 # Создаем готовые "проверяльщики"
 allow_admin = RoleChecker(["ADMIN"])
-allow_teacher = RoleChecker(["TEACHER", "ADMIN"]) # Админ тоже может всё, что может учитель
\ No newline at end of file
+allow_teacher = RoleChecker(["TEACHER", "ADMIN"]) # Админ тоже может всё, что может учитель
@@ -1,12 +1,16 @@
 from typing import Annotated, List, Dict, Any
 from datetime import date
 from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy import func
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 from pydantic import BaseModel
 
 from app.db.session import get_db
-from app.models.school import Grade, Student, Schedule, FinalGrade
+from app.db.replica import get_read_db
+from app.db.upsert import build_upsert, upsert_with_previous
+from app.models.school import Grade, Student, Schedule, FinalGrade, GradeTotal
+from app.services.grade_totals import apply_grade_changes
 from app.api.deps import allow_teacher, get_current_user
 
 router = APIRouter()
@@ -24,6 +28,64 @@ class FinalGradeCreate(BaseModel):
     student_id: int
     subject_id: int
 
+class GradeBatch(BaseModel):
+    cells: List[GradeCreate]
+
+class FinalGradeBatch(BaseModel):
+    cells: List[FinalGradeCreate]
+
+# --- ОБЩЕЕ ДЛЯ ПАКЕТНОГО ВВОДА ---
+async def find_existing_students(db: AsyncSession, student_ids) -> set:
+    res = await db.execute(select(Student.id).filter(Student.id.in_(set(student_ids))))
+    return set(res.scalars().all())
+
+def cell_result(cell: BaseModel, status: str, detail: str | None = None) -> Dict[str, Any]:
+    result = cell.model_dump(mode="json")
+    result["status"] = status # "created" | "updated" | "error"
+    if detail:
+        result["detail"] = detail
+    return result
+
+async def apply_batch(db: AsyncSession, model, cells: list, key_columns: list[str]) -> List[Dict[str, Any]]:
+    """
+    Общая логика пакетного ввода:
+    1 запрос - какие ученики существуют, затем upsert_with_previous для всех ячеек сразу
+    (он же говорит, какие ячейки уже были заполнены и чем - для created/updated).
+    Для обычных оценок в той же транзакции обновляются суммы grade_totals.
+    """
+    known_students = await find_existing_students(db, (c.student_id for c in cells))
+
+    accepted = [] # (ячейка, ключ, повтор ключа в этом пакете)
+    rows = {} # Дубликаты в одном пакете - побеждает последний
+    for cell in cells:
+        if cell.student_id not in known_students:
+            accepted.append((cell, None, False))
+            continue
+        key = tuple(getattr(cell, col) for col in key_columns)
+        accepted.append((cell, key, key in rows))
+        rows[key] = cell.model_dump()
+
+    previous = {}
+    if rows:
+        previous = await upsert_with_previous(
+            db, model, list(rows.values()), conflict_columns=key_columns, update_columns=["value"],
+            track_column="value"
+        )
+        if model is Grade:
+            await apply_grade_changes(db, [
+                (row["student_id"], row["subject_id"], row["date"], previous.get(key), row["value"])
+                for key, row in rows.items()
+            ])
+        await db.commit()
+
+    results = []
+    for cell, key, repeated in accepted:
+        if key is None:
+            results.append(cell_result(cell, "error", "Student not found"))
+        else:
+            results.append(cell_result(cell, "updated" if repeated or key in previous else "created"))
+    return results
+
 # --- 1. ОБЫЧНАЯ ОЦЕНКА (УРОК) ---
 @router.post("/")
 async def create_grade(
@@ -31,21 +93,14 @@ async def create_grade(
     db: Annotated[AsyncSession, Depends(get_db)],
     _ = Depends(allow_teacher)
 ):
-    # Ищем, есть ли уже оценка у этого ученика по этому предмету в эту дату
-    q = select(Grade).filter(
-        Grade.student_id == grade_in.student_id,
-        Grade.subject_id == grade_in.subject_id,
-        Grade.date == grade_in.date
+    # Одна оценка на ученика/предмет/день: вставляем или обновляем,
+    # заодно узнаем старое значение (для сумм grade_totals)
+    key = (grade_in.student_id, grade_in.subject_id, grade_in.date)
+    previous = await upsert_with_previous(
+        db, Grade, [grade_in.model_dump()],
+        conflict_columns=["student_id", "subject_id", "date"], update_columns=["value"], track_column="value"
     )
-    res = await db.execute(q)
-    existing_grade = res.scalars().first()
-
-    if existing_grade:
-        existing_grade.value = grade_in.value # Обновляем
-    else:
-        new_grade = Grade(**grade_in.model_dump())
-        db.add(new_grade)
-    
+    await apply_grade_changes(db, [(*key, previous.get(key), grade_in.value)])
     await db.commit()
     return {"ok": True}
 
@@ -56,81 +111,107 @@ async def set_final_grade(
     db: Annotated[AsyncSession, Depends(get_db)],
     _ = Depends(allow_teacher)
 ):
-    # Ищем старую итоговую
-    q = select(FinalGrade).filter(
-        FinalGrade.student_id == data.student_id,
-        FinalGrade.subject_id == data.subject_id,
-        FinalGrade.period_name == data.period_name
-    )
-    res = await db.execute(q)
-    existing = res.scalars().first()
-
-    if existing:
-        existing.value = data.value
-    else:
-        new_final = FinalGrade(
-            student_id=data.student_id,
-            subject_id=data.subject_id,
-            period_name=data.period_name,
-            value=data.value
-        )
-        db.add(new_final)
-    
+    await db.execute(build_upsert(
+        db, FinalGrade, [data.model_dump()],
+        conflict_columns=["student_id", "subject_id", "period_name"], update_columns=["value"]
+    ))
     await db.commit()
     return {"ok": True}
 
+# --- 2.1 ПАКЕТНЫЙ ВВОД ОЦЕНОК (КОЛОНКА ЖУРНАЛА) ---
+@router.post("/batch")
+async def create_grades_batch(
+    data: GradeBatch,
+    db: Annotated[AsyncSession, Depends(get_db)],
+    _ = Depends(allow_teacher)
+):
+    """
+    Сохраняет сразу много ячеек журнала одной транзакцией.
+    Возвращает результат по каждой ячейке.
+    """
+    results = await apply_batch(db, Grade, data.cells, ["student_id", "subject_id", "date"])
+    return {"results": results}
+
+# --- 2.2 ПАКЕТНЫЙ ВВОД ИТОГОВЫХ ---
+@router.post("/final/batch")
+async def set_final_grades_batch(
+    data: FinalGradeBatch,
+    db: Annotated[AsyncSession, Depends(get_db)],
+    _ = Depends(allow_teacher)
+):
+    results = await apply_batch(db, FinalGrade, data.cells, ["student_id", "subject_id", "period_name"])
+    return {"results": results}
+
 # --- 3. ПОЛУЧЕНИЕ МАТРИЦЫ (СВОДНЫЙ ЖУРНАЛ) ---
 @router.get("/matrix")
 async def get_grades_matrix(
     class_id: int,
     subject_id: int,
     period_name: str, # Например "Q1" (нужно для загрузки итоговых)
-    db: Annotated[AsyncSession, Depends(get_db)],
+    db: Annotated[AsyncSession, Depends(get_read_db)],
     _ = Depends(allow_teacher)
 ):
-    # A. Получаем всех учеников класса
-    res_st = await db.execute(select(Student).filter(Student.class_group_id == class_id).order_by(Student.full_name))
-    students = res_st.scalars().all()
+    # A. Получаем всех учеников класса (только нужные колонки)
+    res_st = await db.execute(
+        select(Student.id, Student.full_name)
+        .filter(Student.class_group_id == class_id)
+        .order_by(Student.full_name)
+    )
+    students = res_st.all()
 
-    # B. Получаем все даты уроков (из расписания или из оценок)
-    # Для простоты возьмем уникальные даты из таблицы оценок по этому предмету + даты из расписания
-    # Но проще всего взять просто все оценки
-    res_grades = await db.execute(select(Grade).filter(Grade.subject_id == subject_id))
-    all_grades = res_grades.scalars().all()
+    # B. Берем оценки только учеников ЭТОГО класса по предмету (JOIN, а не вся школа)
+    res_grades = await db.execute(
+        select(Grade.student_id, Grade.date, Grade.value)
+        .join(Student, Student.id == Grade.student_id)
+        .filter(Student.class_group_id == class_id, Grade.subject_id == subject_id)
+    )
+
+    # Один проход: раскладываем оценки по ученикам и собираем даты
+    grades_by_student: Dict[int, Dict[str, int]] = {}
+    all_dates = set()
+    for student_id, grade_date, value in res_grades:
+        day = grade_date.isoformat()
+        all_dates.add(day)
+        grades_by_student.setdefault(student_id, {})[day] = value
+
+    # Суммы и количество - готовые, из grade_totals (по строке на месяц, а не на оценку)
+    res_totals = await db.execute(
+        select(GradeTotal.student_id, func.sum(GradeTotal.total), func.sum(GradeTotal.count))
+        .join(Student, Student.id == GradeTotal.student_id)
+        .filter(Student.class_group_id == class_id, GradeTotal.subject_id == subject_id)
+        .group_by(GradeTotal.student_id)
+    )
+    totals = {student_id: (total_sum, count) for student_id, total_sum, count in res_totals}
 
     # Собираем уникальные даты уроков (сортируем)
-    dates = sorted(list(set([g.date.isoformat() for g in all_grades])))
+    dates = sorted(all_dates)
 
-    # C. Получаем итоговые оценки за этот период
-    res_finals = await db.execute(select(FinalGrade).filter(FinalGrade.subject_id == subject_id, FinalGrade.period_name == period_name))
-    all_finals = res_finals.scalars().all()
+    # C. Получаем итоговые оценки за этот период (тоже только по классу)
+    res_finals = await db.execute(
+        select(FinalGrade.student_id, FinalGrade.value)
+        .join(Student, Student.id == FinalGrade.student_id)
+        .filter(
+            Student.class_group_id == class_id,
+            FinalGrade.subject_id == subject_id,
+            FinalGrade.period_name == period_name
+        )
+    )
+    finals = {student_id: value for student_id, value in res_finals}
 
     # D. Собираем структуру данных
     matrix = []
-    for s in students:
-        student_grades = {}
-        total_sum = 0
-        count = 0
-        
-        # Оценки по датам
-        for g in all_grades:
-            if g.student_id == s.id:
-                student_grades[g.date.isoformat()] = g.value
-                total_sum += g.value
-                count += 1
-        
+    for student_id, full_name in students:
+        total_sum, count = totals.get(student_id, (0, 0))
+
         # Средний балл
         avg = round(total_sum / count, 2) if count > 0 else 0
-        
-        # Итоговая оценка
-        final_g = next((f.value for f in all_finals if f.student_id == s.id), None)
 
         matrix.append({
-            "student_id": s.id,
-            "full_name": s.full_name,
-            "grades": student_grades, # Словарь {"2026-01-15": 5, "2026-01-16": 4}
+            "student_id": student_id,
+            "full_name": full_name,
+            "grades": grades_by_student.get(student_id, {}), # Словарь {"2026-01-15": 5, "2026-01-16": 4}
             "average": avg,
-            "final_grade": final_g
+            "final_grade": finals.get(student_id)
         })
 
     return {
@@ -0,0 +1,54 @@
+from urllib.parse import quote
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import FileResponse, JSONResponse
+
+from app.api.deps import get_current_user
+from app.services.jobs import job_runner, JobQueueFull
+
+router = APIRouter()
+
+def submit_job(kind: str, current_user, func):
+    """Ставит задачу в фоновую очередь и сразу отвечает 202 с ее id."""
+    try:
+        job = job_runner.submit(kind, current_user.id, func)
+    except JobQueueFull:
+        raise HTTPException(status_code=503, detail="Очередь задач переполнена, попробуйте позже")
+    return JSONResponse(status_code=202, content={"job_id": job.id, "status_url": f"/jobs/{job.id}"})
+
+def get_own_job(job_id: str, current_user):
+    job = job_runner.get(job_id)
+    # Чужие задачи видит только админ
+    if not job or (job.owner_id != current_user.id and current_user.role != "ADMIN"):
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+# --- 1. МОИ ЗАДАЧИ ---
+@router.get("/")
+async def list_jobs(current_user = Depends(get_current_user)):
+    jobs = [
+        job.to_dict() for job in job_runner.jobs.values()
+        if job.owner_id == current_user.id or current_user.role == "ADMIN"
+    ]
+    return {"jobs": jobs, "runner": job_runner.stats()}
+
+# --- 2. СТАТУС И ПРОГРЕСС ---
+@router.get("/{job_id}")
+async def get_job_status(job_id: str, current_user = Depends(get_current_user)):
+    return get_own_job(job_id, current_user).to_dict()
+
+# --- 3. РЕЗУЛЬТАТ (JSON или файл) ---
+@router.get("/{job_id}/result")
+async def get_job_result(job_id: str, current_user = Depends(get_current_user)):
+    job = get_own_job(job_id, current_user)
+    if job.status == "failed":
+        raise HTTPException(status_code=500, detail=f"Задача завершилась с ошибкой: {job.error}")
+    if job.status != "done":
+        raise HTTPException(status_code=409, detail="Задача еще выполняется")
+
+    if job.file_path:
+        return FileResponse(
+            job.file_path,
+            media_type=job.media_type,
+            headers={"Content-Disposition": f"attachment; filename={quote(job.filename)}"}
+        )
+    return job.result
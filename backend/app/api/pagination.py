@@ -0,0 +1,88 @@
+import base64
+import json
+from datetime import date, datetime
+from typing import Annotated
+from fastapi import HTTPException, Query, Response
+from sqlalchemy import and_, or_, func, false
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+PAGE_SIZE_DEFAULT = 500
+PAGE_SIZE_MAX = 1000
+
+class PageParams:
+    """
+    Параметры курсорной (keyset) пагинации для списков.
+    Ответ остается массивом (как раньше), а служебные данные идут в заголовках:
+    X-Next-Cursor - курсор следующей страницы (нет заголовка = это последняя),
+    X-Total-Count - общее число строк (только если include_total=true).
+    """
+    def __init__(
+        self,
+        cursor: Annotated[str | None, Query(description="X-Next-Cursor из предыдущего ответа")] = None,
+        limit: Annotated[int, Query(ge=1, le=PAGE_SIZE_MAX)] = PAGE_SIZE_DEFAULT,
+        include_total: bool = False
+    ):
+        self.cursor = cursor
+        self.limit = limit
+        self.include_total = include_total
+
+def encode_cursor(values: list) -> str:
+    raw = json.dumps([v.isoformat() if isinstance(v, (date, datetime)) else v for v in values])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str, columns: list) -> list:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        values = json.loads(raw)
+        if not isinstance(values, list) or len(values) != len(columns):
+            raise ValueError(cursor)
+        # Возвращаем даты в исходный тип колонки
+        return [
+            date.fromisoformat(v) if v is not None and col.type.python_type is date else v
+            for v, col in zip(values, columns)
+        ]
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def keyset_after(columns: list, values: list, nulls_last: bool):
+    """
+    (c1, c2, ...) > (v1, v2, ...) без tuple-сравнения (работает в любой БД).
+    Колонки могут быть NULL (full_name, name): сравниваем так же, как их сортирует БД
+    при обычном ORDER BY (SQLite - NULL в начале, Postgres - в конце), чтобы индекс работал.
+    """
+    def equal(column, value):
+        return column.is_(None) if value is None else column == value
+
+    def after(column, value):
+        if value is None:
+            return false() if nulls_last else column.isnot(None)
+        return or_(column > value, column.is_(None)) if nulls_last else column > value
+
+    conditions = []
+    for i, (column, value) in enumerate(zip(columns, values)):
+        equal_prefix = [equal(columns[j], values[j]) for j in range(i)]
+        conditions.append(and_(*equal_prefix, after(column, value)))
+    return or_(*conditions)
+
+async def paginate(db: AsyncSession, query, order_columns: list, page: PageParams, response: Response) -> list:
+    """
+    Выполняет query постранично по order_columns (последняя колонка - уникальный id).
+    Возвращает объекты страницы и выставляет заголовки X-Next-Cursor / X-Total-Count.
+    """
+    if page.include_total:
+        total = await db.execute(select(func.count()).select_from(query.order_by(None).subquery()))
+        response.headers["X-Total-Count"] = str(total.scalar())
+
+    if page.cursor:
+        nulls_last = db.get_bind().dialect.name == "postgresql"
+        query = query.filter(keyset_after(order_columns, decode_cursor(page.cursor, order_columns), nulls_last))
+
+    result = await db.execute(query.order_by(*order_columns).limit(page.limit + 1))
+    items = result.scalars().all()
+
+    if len(items) > page.limit:
+        items = items[:page.limit]
+        last = items[-1]
+        response.headers["X-Next-Cursor"] = encode_cursor([getattr(last, col.key) for col in order_columns])
+    return items
@@ -1,158 +1,155 @@
 from typing import Annotated
 from datetime import date
-import io
+import tempfile
 from urllib.parse import quote  # 👈 1. ДОБАВЛЕН ВАЖНЫЙ ИМПОРТ
 
-from fastapi import APIRouter, Depends, Query
+from fastapi import APIRouter, Depends, HTTPException, Query
 from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.future import select
-from openpyxl import Workbook
-from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
 
-from app.db.session import get_db
-from app.models.school import Student, Grade, Attendance, ClassGroup
-from app.api.deps import allow_teacher
+from app.db.session import ReadSessionLocal
+from app.db.replica import get_read_db
+from app.models.school import ClassGroup
+from app.api.deps import allow_teacher, allow_admin
+from app.services.reports import REPORT_TYPES, XLSX_MEDIA_TYPE, get_report_data, write_report_workbook
+from app.api.jobs import submit_job
+from app.services.excel_pool import spool_path
+from app.services.extract import EXTRACT_FORMATS, stream_extract
+from app.services.attendance_daily import get_attendance_overview
 
 router = APIRouter()
 
 # --- ВСПОМОГАТЕЛЬНАЯ ФУНКЦИЯ ---
-async def get_report_data(class_id: int, start_date: date, end_date: date, report_type: str, db: AsyncSession):
-    res_st = await db.execute(select(Student).filter(Student.class_group_id == class_id).order_by(Student.full_name))
-    students = res_st.scalars().all()
-    
-    data = []
-
-    for s in students:
-        row = {"full_name": s.full_name}
-        
-        if report_type == "grades":
-            query = select(Grade).filter(
-                Grade.student_id == s.id,
-                Grade.date >= start_date,
-                Grade.date <= end_date
-            )
-            res_grades = await db.execute(query)
-            grades = res_grades.scalars().all()
-            
-            if grades:
-                avg = sum(g.value for g in grades) / len(grades)
-                row["value"] = round(avg, 2)
-                row["count"] = len(grades)
-            else:
-                row["value"] = 0
-                row["count"] = 0
-
-        elif report_type == "attendance":
-            query = select(Attendance).filter(
-                Attendance.student_id == s.id,
-                Attendance.date >= start_date,
-                Attendance.date <= end_date
-            )
-            res_att = await db.execute(query)
-            atts = res_att.scalars().all()
-            
-            row["absent"] = sum(1 for a in atts if a.status == 'ABSENT')
-            row["late"] = sum(1 for a in atts if a.status == 'LATE')
-        
-        data.append(row)
-    
-    return data
+def resolve_class_ids(class_id: list[int] | None, report_type: str, current_user) -> list[int] | None:
+    """
+    Проверяет параметры отчета.
+    Без class_id - отчет по всей школе (только для админа).
+    """
+    if report_type not in REPORT_TYPES:
+        raise HTTPException(status_code=400, detail="Unknown report type")
+    if not class_id and current_user.role != "ADMIN":
+        raise HTTPException(status_code=403, detail="Отчет по всей школе доступен только администратору")
+    return class_id or None
 
 # --- 1. JSON ОТЧЕТ ---
 @router.get("/view")
 async def view_report(
-    class_id: int,
     report_type: str,
     start_date: date,
     end_date: date,
-    db: Annotated[AsyncSession, Depends(get_db)],
-    _ = Depends(allow_teacher)
+    db: Annotated[AsyncSession, Depends(get_read_db)],
+    current_user = Depends(allow_teacher),
+    class_id: list[int] | None = Query(None), # ?class_id=1&class_id=2, без параметра - вся школа
+    background: bool = False # true -> вернуть job_id, результат забрать в /jobs/{id}/result
 ):
-    data = await get_report_data(class_id, start_date, end_date, report_type, db)
+    class_ids = resolve_class_ids(class_id, report_type, current_user)
+
+    if background:
+        async def run(job):
+            async with ReadSessionLocal() as session:
+                job.result = await get_report_data(session, class_ids, start_date, end_date, report_type)
+            job.set_progress(len(job.result), len(job.result))
+        return submit_job("report_view", current_user, run)
+
+    data = await get_report_data(db, class_ids, start_date, end_date, report_type)
     return data
 
+# --- 1.1 СВОДКА ПОСЕЩАЕМОСТИ (ПО ДНЯМ И КЛАССАМ) ---
+@router.get("/attendance/overview")
+async def attendance_overview(
+    start_date: date,
+    end_date: date,
+    db: Annotated[AsyncSession, Depends(get_read_db)],
+    current_user = Depends(allow_teacher),
+    class_id: list[int] | None = Query(None) # без параметра - вся школа (только админ)
+):
+    """
+    Присутствовали / отсутствовали / опоздали: итого, по дням и по классам.
+    Читается из сводной таблицы attendance_daily (класс x день), а не из всех отметок.
+    """
+    class_ids = resolve_class_ids(class_id, "attendance", current_user)
+    return await get_attendance_overview(db, class_ids, start_date, end_date)
+
 # --- 2. EXCEL ЭКСПОРТ ---
+EXPORT_CHUNK_SIZE = 64 * 1024
+
+def iter_file_chunks(fileobj, chunk_size: int = EXPORT_CHUNK_SIZE):
+    """Отдает файл клиенту кусками и закрывает (удаляет) его в конце."""
+    try:
+        fileobj.seek(0)
+        while chunk := fileobj.read(chunk_size):
+            yield chunk
+    finally:
+        fileobj.close()
+
 @router.get("/export")
 async def export_report(
-    class_id: int,
     report_type: str,
     start_date: date,
     end_date: date,
-    db: Annotated[AsyncSession, Depends(get_db)],
-    _ = Depends(allow_teacher)
+    db: Annotated[AsyncSession, Depends(get_read_db)],
+    current_user = Depends(allow_teacher),
+    class_id: list[int] | None = Query(None), # несколько классов / вся школа -> по листу на класс
+    background: bool = False
 ):
-    # 1. Получаем данные
-    data = await get_report_data(class_id, start_date, end_date, report_type, db)
-    class_info = await db.get(ClassGroup, class_id)
-    class_name = class_info.name if class_info else "Unknown"
-
-    # 2. Создаем Excel
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "Отчет"
-
-    # Стили
-    bold_font = Font(bold=True, color="FFFFFF")
-    header_fill = PatternFill(start_color="4F81BD", end_color="4F81BD", fill_type="solid")
-    center_align = Alignment(horizontal="center", vertical="center")
-    thin_border = Border(left=Side(style='thin'), right=Side(style='thin'), top=Side(style='thin'), bottom=Side(style='thin'))
-
-    # Заголовок
-    ws.merge_cells('A1:D1')
-    ws['A1'] = f"Отчет: {('Успеваемость' if report_type == 'grades' else 'Посещаемость')} | Класс: {class_name}"
-    ws['A1'].font = Font(size=14, bold=True)
-    ws['A1'].alignment = center_align
-
-    ws.merge_cells('A2:D2')
-    ws['A2'] = f"Период: {start_date} — {end_date}"
-    ws['A2'].alignment = center_align
-
-    # Шапка
-    headers = ["№", "ФИО Ученика"]
-    if report_type == "grades":
-        headers.extend(["Средний балл", "Кол-во оценок"])
+    class_ids = resolve_class_ids(class_id, report_type, current_user)
+    if class_ids and len(class_ids) == 1:
+        class_info = await db.get(ClassGroup, class_ids[0])
+        class_name = class_info.name if class_info else "Unknown"
     else:
-        headers.extend(["Пропуски (Н/Б)", "Опоздания"])
-
-    ws.append([]) 
-    ws.append(headers) 
-
-    for col_num, header in enumerate(headers, 1):
-        cell = ws.cell(row=4, column=col_num)
-        cell.fill = header_fill
-        cell.font = bold_font
-        cell.alignment = center_align
-        cell.border = thin_border
-
-    # Данные
-    for idx, row in enumerate(data, 1):
-        excel_row = [idx, row["full_name"]]
-        if report_type == "grades":
-            excel_row.append(row["value"])
-            excel_row.append(row["count"])
-        else:
-            excel_row.append(row["absent"])
-            excel_row.append(row["late"])
-        ws.append(excel_row)
-        for col_num in range(1, len(headers) + 1):
-            ws.cell(row=4 + idx, column=col_num).border = thin_border
-
-    ws.column_dimensions['A'].width = 5
-    ws.column_dimensions['B'].width = 35
-    ws.column_dimensions['C'].width = 15
-    ws.column_dimensions['D'].width = 15
-
-    output = io.BytesIO()
-    wb.save(output)
-    output.seek(0)
-
-    # 3. 👇 ИСПРАВЛЕННАЯ ЛОГИКА ИМЕНИ ФАЙЛА 👇
+        class_name = "Вся школа" if not class_ids else "Классы"
+
+    # 👇 ИСПРАВЛЕННАЯ ЛОГИКА ИМЕНИ ФАЙЛА 👇
     filename = f"Report_{class_name}_{report_type}_{start_date}.xlsx"
+
+    if background:
+        async def run(job):
+            job.file_path = spool_path(".xlsx") # Удалит job_runner вместе с задачей
+            async with ReadSessionLocal() as session:
+                rows = await write_report_workbook(
+                    session, class_ids, start_date, end_date, report_type, class_name, job.file_path, job.set_progress
+                )
+            job.set_progress(rows, rows)
+            job.filename = filename
+            job.media_type = XLSX_MEDIA_TYPE
+        return submit_job("report_export", current_user, run)
+
+    # 1. Пишем Excel во временный файл на диске (не в BytesIO) и отдаем кусками.
+    # Файл пишет процесс excel_pool по имени; удаляется при закрытии (в iter_file_chunks)
+    output = tempfile.NamedTemporaryFile(suffix=".xlsx")
+    await write_report_workbook(db, class_ids, start_date, end_date, report_type, class_name, output.name)
+
     encoded_filename = quote(filename)  # Кодируем русские буквы в %D0%90...
-    
     return StreamingResponse(
-        output, 
-        media_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+        iter_file_chunks(output),
+        media_type=XLSX_MEDIA_TYPE,
         headers={"Content-Disposition": f"attachment; filename={encoded_filename}"}
-    )
\ No newline at end of file
+    )
+
+# --- 3. ВЫГРУЗКА СЫРЫХ ДАННЫХ (NDJSON / CSV) ДЛЯ АНАЛИТИКИ ---
+EXTRACT_DATASETS = ("grades", "final_grades", "attendance")
+
+@router.get("/extract/{dataset}")
+async def extract_dataset(
+    dataset: str,
+    _ = Depends(allow_admin),
+    format: str = "ndjson",
+    start_date: date | None = None,
+    end_date: date | None = None,
+    period_name: str | None = None # Только для final_grades
+):
+    """
+    Потоковая выгрузка оценок, итоговых или посещаемости за период.
+    Данные читаются серверным курсором и отдаются сразу, без загрузки всего в память.
+    """
+    if dataset not in EXTRACT_DATASETS:
+        raise HTTPException(status_code=404, detail="Unknown dataset")
+    if format not in EXTRACT_FORMATS:
+        raise HTTPException(status_code=400, detail="Format must be ndjson or csv")
+
+    filename = f"{dataset}_{start_date or 'all'}_{end_date or 'all'}.{format}"
+    return StreamingResponse(
+        stream_extract(dataset, format, start_date, end_date, period_name),
+        media_type=EXTRACT_FORMATS[format],
+        headers={"Content-Disposition": f"attachment; filename={quote(filename)}"}
+    )
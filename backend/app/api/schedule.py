@@ -1,17 +1,27 @@
 from typing import Annotated
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import or_, delete, insert
 from sqlalchemy.future import select
 from sqlalchemy.orm import selectinload
 
 from app.db.session import get_db
 from app.models.school import Schedule, ClassGroup, Subject
 from app.models.user import User 
-from app.schemas.school import ScheduleCreate, ScheduleResponse
+from app.schemas.school import ScheduleCreate, ScheduleResponse, ScheduleImport
+from app.services.timetable import lesson_interval, overlaps, find_conflicts, timetable_cache
+from app.api.caching import cached_json_response
 from app.api.deps import allow_admin, get_current_user
 
 router = APIRouter()
 
+def safe_interval(lesson) -> tuple[int, int]:
+    """Интервал урока из БД. Старые записи с кривым временем считаем нулевыми (без конфликтов)."""
+    try:
+        return lesson_interval(lesson)
+    except ValueError:
+        return (0, 0)
+
 @router.post("/", response_model=ScheduleResponse)
 async def create_schedule_item(
     schedule_in: ScheduleCreate,
@@ -31,38 +41,33 @@ async def create_schedule_item(
     # ==========================================
     # 🔥 ПОЛИЦИЯ КОНФЛИКТОВ (ПРОВЕРКИ) 🔥
     # ==========================================
+    # Проверяем пересечение ИНТЕРВАЛОВ времени (а не только одинаковое начало)
+    try:
+        new_interval = lesson_interval(schedule_in)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Неверное время урока (ожидается ЧЧ:ММ, конец позже начала)")
 
-    # А. ПРОВЕРКА КАБИНЕТА
-    # Ищем: есть ли урок в этот день, в это время, в этом кабинете?
-    q_room = select(Schedule).filter(
+    # Один запрос: все уроки этого дня в том же кабинете, у того же учителя или класса
+    res = await db.execute(select(Schedule).filter(
         Schedule.day_of_week == schedule_in.day_of_week,
-        Schedule.start_time == schedule_in.start_time,
-        Schedule.room_number == schedule_in.room_number
-    )
-    res_room = await db.execute(q_room)
-    if res_room.scalars().first():
+        or_(
+            Schedule.room_number == schedule_in.room_number,
+            Schedule.teacher_id == schedule_in.teacher_id,
+            Schedule.class_group_id == schedule_in.class_group_id
+        )
+    ))
+    busy = [lesson for lesson in res.scalars().all() if overlaps(new_interval, safe_interval(lesson))]
+
+    # А. ПРОВЕРКА КАБИНЕТА
+    if any(lesson.room_number == schedule_in.room_number for lesson in busy):
         raise HTTPException(status_code=400, detail=f"⛔ Кабинет {schedule_in.room_number} уже занят в это время!")
 
     # Б. ПРОВЕРКА УЧИТЕЛЯ
-    # Ищем: занят ли этот учитель другим уроком в это же время?
-    q_teacher = select(Schedule).filter(
-        Schedule.day_of_week == schedule_in.day_of_week,
-        Schedule.start_time == schedule_in.start_time,
-        Schedule.teacher_id == schedule_in.teacher_id
-    )
-    res_teacher = await db.execute(q_teacher)
-    if res_teacher.scalars().first():
+    if any(lesson.teacher_id == schedule_in.teacher_id for lesson in busy):
         raise HTTPException(status_code=400, detail=f"⛔ Учитель {teacher_exists.email} уже ведет урок в это время!")
 
     # В. ПРОВЕРКА КЛАССА
-    # Ищем: есть ли у этого класса урок в это время?
-    q_class = select(Schedule).filter(
-        Schedule.day_of_week == schedule_in.day_of_week,
-        Schedule.start_time == schedule_in.start_time,
-        Schedule.class_group_id == schedule_in.class_group_id
-    )
-    res_class = await db.execute(q_class)
-    if res_class.scalars().first():
+    if any(lesson.class_group_id == schedule_in.class_group_id for lesson in busy):
         raise HTTPException(status_code=400, detail=f"⛔ У класса {class_exists.name} уже есть урок в это время!")
 
     # ==========================================
@@ -80,24 +85,93 @@ async def create_schedule_item(
     db.add(new_item)
     await db.commit()
     await db.refresh(new_item)
+    await timetable_cache.bump(db)
     return new_item
 
-# ... (Остальной код get_schedule и delete_schedule_item оставьте без изменений) ...
-@router.get("/", response_model=list[ScheduleResponse])
-async def get_schedule(
+# --- ИМПОРТ ВСЕЙ СЕТКИ (НЕДЕЛЯ) ---
+@router.post("/import")
+async def import_schedule(
+    data: ScheduleImport,
     db: Annotated[AsyncSession, Depends(get_db)],
-    current_user = Depends(get_current_user),
-    class_id: int | None = None,
-    teacher_id: int | None = None,
-    day: str | None = None
+    _ = Depends(allow_admin)
 ):
+    """
+    Проверяет всю сетку в памяти (пересечения по кабинету, учителю и классу)
+    и сохраняет все уроки без ошибок одной транзакцией.
+    С replace_classes - все или ничего: если хоть одна строка с ошибкой или конфликтом,
+    ничего не удаляем и не сохраняем (иначе класс остался бы без уроков из плохих строк).
+    Возвращает сразу все ошибки и конфликты.
+    """
+    lessons = data.lessons
+    errors = []
+
+    # 1. Справочники - по одному запросу на таблицу
+    class_ids = {l.class_group_id for l in lessons}
+    res_classes = await db.execute(select(ClassGroup.id).filter(ClassGroup.id.in_(class_ids)))
+    known_classes = set(res_classes.scalars().all())
+    res_subjects = await db.execute(select(Subject.id).filter(Subject.id.in_({l.subject_id for l in lessons})))
+    known_subjects = set(res_subjects.scalars().all())
+    res_teachers = await db.execute(select(User.id).filter(
+        User.id.in_({l.teacher_id for l in lessons}), User.role == "TEACHER"
+    ))
+    known_teachers = set(res_teachers.scalars().all())
+
+    candidates = []
+    for idx, lesson in enumerate(lessons):
+        if lesson.class_group_id not in known_classes or lesson.subject_id not in known_subjects:
+            errors.append({"lesson": idx, "detail": "Класс или Предмет не найдены"})
+        elif lesson.teacher_id not in known_teachers:
+            errors.append({"lesson": idx, "detail": "Учитель не найден или это не учитель"})
+        else:
+            try:
+                lesson_interval(lesson)
+                candidates.append((idx, lesson))
+            except ValueError:
+                errors.append({"lesson": idx, "detail": "Неверное время урока (ожидается ЧЧ:ММ, конец позже начала)"})
+
+    # 2. Уже сохраненные уроки тех же дней (один запрос)
+    query = select(Schedule).filter(Schedule.day_of_week.in_({l.day_of_week for l in lessons}))
+    if data.replace_classes:
+        query = query.filter(Schedule.class_group_id.notin_(class_ids))
+    res_existing = await db.execute(query)
+    existing = [
+        (f"db:{lesson.id}", lesson) for lesson in res_existing.scalars().all()
+        if safe_interval(lesson) != (0, 0)
+    ]
+
+    # 3. Конфликты: сортировка + проход по интервалам, O(n log n)
+    conflicts = [
+        c for c in find_conflicts(existing + candidates)
+        if any(isinstance(key, int) for key in c["lessons"]) # Старые уроки между собой не интересуют
+    ]
+    bad = {key for c in conflicts for key in c["lessons"] if isinstance(key, int)}
+    valid = [lesson for idx, lesson in candidates if idx not in bad]
+
+    # 4. Сохраняем валидные одной транзакцией
+    write = not data.dry_run and not (data.replace_classes and (errors or conflicts))
+    if write:
+        if data.replace_classes:
+            await db.execute(delete(Schedule).where(Schedule.class_group_id.in_(class_ids)))
+        if valid:
+            await db.execute(insert(Schedule), [lesson.model_dump() for lesson in valid])
+        await db.commit()
+        await timetable_cache.bump(db)
+
+    return {
+        "created": len(valid) if write else 0,
+        "valid": len(valid),
+        "errors": errors,
+        "conflicts": conflicts,
+    }
+
+async def load_schedule(db: AsyncSession, own_teacher_id: int | None, class_id: int | None, teacher_id: int | None, day: str | None):
     query = select(Schedule).options(
         selectinload(Schedule.subject),
         selectinload(Schedule.class_group),
         selectinload(Schedule.teacher)
     )
-    if current_user.role == "TEACHER":
-        query = query.filter(Schedule.teacher_id == current_user.id)
+    if own_teacher_id:
+        query = query.filter(Schedule.teacher_id == own_teacher_id)
     if class_id:
         query = query.filter(Schedule.class_group_id == class_id)
     if day:
@@ -112,8 +186,27 @@ async def get_schedule(
         resp.subject_name = item.subject.name if item.subject else "Unknown"
         resp.class_group_name = item.class_group.name if item.class_group else "Unknown"
         resp.teacher_name = item.teacher.email if item.teacher else "No Teacher"
-        response_data.append(resp)
-    return response_data
+        response_data.append(resp.model_dump())
+    return response_data, {}
+
+# --- ПОЛУЧЕНИЕ СЕТКИ (СНИМОК ИЗ КЭША, ETag) ---
+@router.get("/", response_model=list[ScheduleResponse])
+async def get_schedule(
+    request: Request,
+    db: Annotated[AsyncSession, Depends(get_db)],
+    current_user = Depends(get_current_user),
+    class_id: int | None = None,
+    teacher_id: int | None = None,
+    day: str | None = None
+):
+    # Учитель видит только свои уроки
+    own_teacher_id = current_user.id if current_user.role == "TEACHER" else None
+    cache_key = (own_teacher_id, class_id, teacher_id, day)
+
+    # Браузер уже видел эту версию сетки -> 304, снимок есть в памяти -> без БД
+    return await cached_json_response(
+        request, db, timetable_cache, cache_key, lambda: load_schedule(db, *cache_key)
+    )
 
 @router.delete("/{id}")
 async def delete_schedule_item(
@@ -126,4 +219,5 @@ async def delete_schedule_item(
         raise HTTPException(status_code=404, detail="Lesson not found")
     await db.delete(item)
     await db.commit()
+    await timetable_cache.bump(db)
     return {"message": "Lesson deleted"}
\ No newline at end of file
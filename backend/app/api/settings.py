@@ -1,11 +1,16 @@
 from typing import Annotated
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request
+from sqlalchemy import delete
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 
 from app.db.session import get_db
-from app.models.school import ClassGroup, Subject, BellSchedule
+from app.models.school import ClassGroup, Subject, BellSchedule, AttendanceDaily
 from app.schemas.school import ClassGroupResponse, SubjectResponse, BellResponse, BellCreate
+from app.services.timetable import timetable_cache
+from app.services.cache_versions import reference_cache
+from app.services.student_search import student_index_cache
+from app.api.caching import cached_json_response
 from app.api.deps import allow_admin # Только админ может менять настройки
 
 router = APIRouter()
@@ -17,14 +22,20 @@ async def create_class(name: str, db: Annotated[AsyncSession, Depends(get_db)],
     db.add(new_class)
     await db.commit()
     await db.refresh(new_class)
+    await reference_cache.bump(db)
     return new_class
 
 @router.delete("/classes/{id}")
 async def delete_class(id: int, db: Annotated[AsyncSession, Depends(get_db)], _=Depends(allow_admin)):
     item = await db.get(ClassGroup, id)
     if item:
+        # Ученики остаются без класса - сводка посещаемости класса больше не нужна
+        await db.execute(delete(AttendanceDaily).where(AttendanceDaily.class_group_id == id))
         await db.delete(item)
         await db.commit()
+        await timetable_cache.bump(db)
+        await reference_cache.bump(db)
+        await student_index_cache.bump(db)
     return {"ok": True}
 
 # --- 2. УПРАВЛЕНИЕ ПРЕДМЕТАМИ ---
@@ -34,14 +45,18 @@ async def create_subject(name: str, db: Annotated[AsyncSession, Depends(get_db)]
     db.add(new_subject)
     await db.commit()
     await db.refresh(new_subject)
+    await reference_cache.bump(db)
     return new_subject
 
 # --- 3. УПРАВЛЕНИЕ ЗВОНКАМИ ---
-@router.get("/bells/", response_model=list[BellResponse])
-async def get_bells(db: Annotated[AsyncSession, Depends(get_db)]):
+async def load_bells(db: AsyncSession):
     # Сортируем по порядку (1, 2, 3 урок)
     result = await db.execute(select(BellSchedule).order_by(BellSchedule.order))
-    return result.scalars().all()
+    return [BellResponse.model_validate(b).model_dump(mode="json") for b in result.scalars().all()], {}
+
+@router.get("/bells/", response_model=list[BellResponse])
+async def get_bells(request: Request, db: Annotated[AsyncSession, Depends(get_db)]):
+    return await cached_json_response(request, db, reference_cache, ("bells",), lambda: load_bells(db))
 
 @router.post("/bells/", response_model=BellResponse)
 async def create_bell(bell: BellCreate, db: Annotated[AsyncSession, Depends(get_db)], _=Depends(allow_admin)):
@@ -54,6 +69,7 @@ async def create_bell(bell: BellCreate, db: Annotated[AsyncSession, Depends(get_
     db.add(new_bell)
     await db.commit()
     await db.refresh(new_bell)
+    await reference_cache.bump(db)
     return new_bell
 
 @router.delete("/bells/{id}")
@@ -62,10 +78,14 @@ async def delete_bell(id: int, db: Annotated[AsyncSession, Depends(get_db)], _=D
     if item:
         await db.delete(item)
         await db.commit()
+        await reference_cache.bump(db)
     return {"ok": True}
 
 
-@router.get("/subjects/", response_model=list[SubjectResponse])
-async def get_subjects(db: Annotated[AsyncSession, Depends(get_db)]):
+async def load_subjects(db: AsyncSession):
     result = await db.execute(select(Subject))
-    return result.scalars().all()
\ No newline at end of file
+    return [SubjectResponse.model_validate(s).model_dump(mode="json") for s in result.scalars().all()], {}
+
+@router.get("/subjects/", response_model=list[SubjectResponse])
+async def get_subjects(request: Request, db: Annotated[AsyncSession, Depends(get_db)]):
+    return await cached_json_response(request, db, reference_cache, ("subjects",), lambda: load_subjects(db))
\ No newline at end of file
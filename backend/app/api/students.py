@@ -1,14 +1,21 @@
+import os
 from typing import Annotated
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Response, Query
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
-from openpyxl import load_workbook
-import io
+from zipfile import BadZipFile
 
-from app.db.session import get_db
+from app.db.session import get_db, AsyncSessionLocal
+from app.db.replica import get_read_db
 from app.models.school import Student, ClassGroup
-from app.schemas.school import StudentCreate, StudentResponse
+from app.schemas.school import StudentCreate, StudentResponse, StudentSearchResult
 from app.api.deps import allow_admin, get_current_user
+from app.api.pagination import PageParams, paginate
+from app.api.jobs import submit_job
+from app.services.attendance_daily import move_students_attendance
+from app.services.roster import IMPORT_MODES, import_roster
+from app.services.excel_pool import read_roster_xlsx, iter_spooled_rows, spool_path
+from app.services.student_search import search_students, student_index_cache
 
 router = APIRouter()
 
@@ -26,55 +33,121 @@ async def create_student(
     db.add(new_student)
     await db.commit()
     await db.refresh(new_student)
+    await student_index_cache.bump(db)
     return new_student
 
 # --- 2. МАССОВАЯ ЗАГРУЗКА (EXCEL) ---
 @router.post("/upload")
 async def upload_students_excel(
-    class_id: int, # В какой класс добавляем всех из файла
+    class_id: int | None = None, # Класс по умолчанию (для строк без колонки "Класс")
+    mode: str = "skip",          # skip | merge | add - что делать с уже существующими
     file: UploadFile = File(...),
     db: Annotated[AsyncSession, Depends(get_db)] = None, # = None заглушка
-    _ = Depends(allow_admin)
+    current_user = Depends(allow_admin),
+    background: bool = False # true -> импорт в фоне, статус в /jobs/{id}
 ):
     """
-    Читает Excel файл. Ожидается, что в Колонке A - Имена учеников.
-    Все ученики из файла будут добавлены в указанный class_id.
+    Файл сохраняется на диск, процесс excel_pool читает его потоково (read_only). Колонка A - Имена учеников,
+    колонка B (необязательно) - название класса, так один файл заполняет много классов.
+    Возвращает отчет: сколько добавлено / пропущено / переведено и ошибки по строкам.
     """
+    if mode not in IMPORT_MODES:
+        raise HTTPException(status_code=400, detail="mode must be skip, merge or add")
+
     # Проверяем, существует ли класс
-    class_group = await db.get(ClassGroup, class_id)
-    if not class_group:
-        raise HTTPException(status_code=404, detail="Class not found")
-
-    # Читаем файл
-    contents = await file.read()
-    wb = load_workbook(filename=io.BytesIO(contents))
-    sheet = wb.active
-    
-    count = 0
-    # Читаем строки (пропускаем заголовок, если он есть - начнем со 2 строки? 
-    # Нет, давайте читать всё с 1-й, если там просто список имен)
-    for row in sheet.iter_rows(values_only=True):
-        full_name = row[0] # Колонка А
-        if full_name:
-            new_student = Student(full_name=str(full_name), class_group_id=class_id)
-            db.add(new_student)
-            count += 1
-    
-    await db.commit()
-    return {"message": f"Успешно добавлено {count} учеников в класс {class_group.name}"}
+    class_group = None
+    if class_id is not None:
+        class_group = await db.get(ClassGroup, class_id)
+        if not class_group:
+            raise HTTPException(status_code=404, detail="Class not found")
+
+    target = f"в класс {class_group.name}" if class_group else "в классы из файла"
+
+    # Файл целиком в память не читаем: кусками на диск, дальше его разбирает процесс excel_pool.
+    # Для фонового импорта это еще и нужно: UploadFile закроется вместе с запросом
+    source_path = await save_upload(file)
+
+    if background:
+        async def run(job):
+            try:
+                async with AsyncSessionLocal() as session:
+                    job.result = await run_roster_import(session, source_path, class_id, mode, target, job.set_progress)
+            finally:
+                os.remove(source_path)
+        try:
+            return submit_job("students_upload", current_user, run)
+        except HTTPException:
+            os.remove(source_path) # Очередь полна (503) - задача не запустится и файл не удалит
+            raise
+
+    try:
+        return await run_roster_import(db, source_path, class_id, mode, target)
+    finally:
+        os.remove(source_path)
+
+UPLOAD_CHUNK_SIZE = 64 * 1024
+
+async def save_upload(file: UploadFile) -> str:
+    """Сохраняет загруженный файл во временный файл кусками (без блокировки event loop). Удаляет вызывающий."""
+    path = spool_path(".xlsx")
+    try:
+        with open(path, "wb") as tmp:
+            while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+                tmp.write(chunk)
+    except BaseException:
+        os.remove(path) # Клиент оборвал загрузку
+        raise
+    return path
+
+async def run_roster_import(db: AsyncSession, source_path: str, class_id: int | None, mode: str, target: str, on_progress=None) -> dict:
+    from openpyxl.utils.exceptions import InvalidFileException # openpyxl грузим только при импорте
+
+    # Процесс пула пишет строки в JSON Lines, import_roster читает их оттуда пачками
+    rows_path = spool_path(".jsonl")
+    try:
+        # 400 - только за ошибки разбора файла; ошибки самого импорта - это баги сервера (500)
+        try:
+            await read_roster_xlsx(source_path, rows_path)
+        except (InvalidFileException, BadZipFile, KeyError):
+            raise HTTPException(status_code=400, detail="Файл не похож на Excel (.xlsx)")
+        report = await import_roster(db, iter_spooled_rows(rows_path), class_id, mode, on_progress)
+    finally:
+        os.remove(rows_path)
+    if report["created"] or report["merged"]:
+        await student_index_cache.bump(db)
+    report["message"] = f"Успешно добавлено {report['created']} учеников {target}"
+    return report
 
 # --- 3. ПОЛУЧИТЬ СПИСОК (С фильтром по классу) ---
 @router.get("/", response_model=list[StudentResponse])
 async def get_students(
-    db: Annotated[AsyncSession, Depends(get_db)],
+    response: Response,
+    db: Annotated[AsyncSession, Depends(get_read_db)],
+    page: Annotated[PageParams, Depends()],
     _ = Depends(get_current_user),
     class_id: int | None = None
 ):
     query = select(Student)
     if class_id:
         query = query.filter(Student.class_group_id == class_id)
-    result = await db.execute(query)
-    return result.scalars().all()
+    # Постранично, по алфавиту (id - для стабильного порядка одинаковых ФИО)
+    return await paginate(db, query, [Student.full_name, Student.id], page, response)
+
+# --- 3.1 ПОИСК / АВТОДОПОЛНЕНИЕ ПО ВСЕЙ ШКОЛЕ ---
+@router.get("/search", response_model=list[StudentSearchResult])
+async def search_students_endpoint(
+    db: Annotated[AsyncSession, Depends(get_db)],
+    q: str = Query(..., min_length=1, max_length=100),
+    limit: int = Query(10, ge=1, le=50),
+    class_id: int | None = None,
+    _ = Depends(get_current_user)
+):
+    """
+    Ученики, чье ФИО начинается с q (или одно из слов), и похожие с опечатками.
+    Сначала совпадения по началу, затем по убыванию похожести; не больше limit.
+    Основная БД, а не реплика: индекс SQLite сбрасывается по версии с основной БД.
+    """
+    return await search_students(db, q, limit, class_id)
 
 # --- 4. ПЕРЕВОД УЧЕНИКА (Трансфер) ---
 @router.put("/{student_id}/transfer")
@@ -94,7 +167,9 @@ async def transfer_student(
     if not new_class:
         raise HTTPException(status_code=404, detail="Target Class not found")
         
-    # Переводим
+    # Переводим (отметки посещаемости переезжают в сводку нового класса)
+    await move_students_attendance(db, [(student.id, student.class_group_id, new_class_id)])
     student.class_group_id = new_class_id
     await db.commit()
+    await student_index_cache.bump(db)
     return {"message": f"Ученик переведен в {new_class.name}"}
\ No newline at end of file
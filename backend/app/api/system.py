@@ -0,0 +1,77 @@
+import secrets
+from typing import Annotated
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import PlainTextResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.metrics import metrics
+from app.core.startup import startup_report
+from app.db.session import engine, pool_stats, replica_engine, replica_pool_stats, get_db
+from app.api.deps import allow_admin, get_optional_user
+from app.services.excel_pool import excel_pool
+from app.services.grade_totals import check_grade_totals
+from app.services.attendance_daily import check_attendance_daily
+
+router = APIRouter()
+
+# --- СОСТОЯНИЕ ПУЛА СОЕДИНЕНИЙ С БД (Админ) ---
+@router.get("/db-pool")
+async def get_db_pool_stats(_ = Depends(allow_admin)):
+    """
+    Сколько соединений выдано, сколько сейчас занято,
+    сколько открыто сверх pool_size и сколько ждали свободного.
+    Если настроена реплика - ее пул в поле replica.
+    """
+    data = pool_stats.snapshot(engine.sync_engine.pool)
+    data["replica"] = replica_pool_stats.snapshot(replica_engine.sync_engine.pool) if replica_engine else None
+    return data
+
+# --- ПУЛ ПРОЦЕССОВ EXCEL (Админ) ---
+@router.get("/excel-pool")
+async def get_excel_pool_stats(_ = Depends(allow_admin)):
+    """Сколько выгрузок/импортов сейчас в работе и в очереди, сколько отказов, время сборки."""
+    return excel_pool.stats()
+
+# --- ОТЧЕТ О ХОЛОДНОМ СТАРТЕ (Админ) ---
+@router.get("/startup")
+async def get_startup_report(_ = Depends(allow_admin)):
+    """Импорт, подключение к БД, проверка схемы и первый запрос этого процесса (мс)."""
+    return startup_report.as_dict()
+
+# --- МЕТРИКИ ДЛЯ PROMETHEUS ---
+@router.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics(request: Request, current_user = Depends(get_optional_user)):
+    """
+    Задержки по маршрутам, статусы, запросы "в полете" и число/время SQL на запрос.
+    Доступ: админ или заголовок Authorization: Bearer <METRICS_TOKEN> (для сборщика).
+    """
+    token = request.headers.get("Authorization", "").removeprefix("Bearer ")
+    token_ok = bool(settings.METRICS_TOKEN) and secrets.compare_digest(token, settings.METRICS_TOKEN)
+    if not token_ok and (not current_user or current_user.role != "ADMIN"):
+        raise HTTPException(status_code=403, detail="Forbidden")
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+# --- СВЕРКА СУММ ОЦЕНОК С СЫРЫМИ ДАННЫМИ (Админ) ---
+@router.get("/grade-totals/check")
+async def check_grade_totals_endpoint(
+    db: Annotated[AsyncSession, Depends(get_db)],
+    _ = Depends(allow_admin)
+):
+    """
+    Сравнивает grade_totals с таблицей grades.
+    Расхождения исправляет `python -m scripts.rebuild_rollups grade_totals`.
+    """
+    return await check_grade_totals(db)
+
+# --- СВЕРКА СВОДКИ ПОСЕЩАЕМОСТИ (Админ) ---
+@router.get("/attendance-daily/check")
+async def check_attendance_daily_endpoint(
+    db: Annotated[AsyncSession, Depends(get_db)],
+    _ = Depends(allow_admin)
+):
+    """
+    Сравнивает attendance_daily с таблицей attendance.
+    Расхождения исправляет `python -m scripts.rebuild_rollups attendance_daily`.
+    """
+    return await check_attendance_daily(db)
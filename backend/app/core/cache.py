@@ -0,0 +1,96 @@
+import time
+import uuid
+import zlib
+from collections import OrderedDict
+from threading import Lock
+from typing import Any, Hashable
+
+_MISSING = object()
+
+class TTLCache:
+    """
+    Простой in-process кэш с ограничением размера (LRU) и временем жизни записей.
+    Кэш живет внутри одного процесса uvicorn: у каждого воркера свой.
+    """
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            item = self._data.get(key, _MISSING)
+            if item is _MISSING:
+                return default
+            expires_at, value = item
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False) # Выкидываем самый старый
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+class VersionedCache:
+    """
+    Кэш "снимков" данных с номером версии.
+    Любое изменение данных вызывает bump(): версия растет, снимки сбрасываются.
+    Версия входит в ETag, поэтому браузер может переспросить через If-None-Match
+    и получить 304 без запроса к БД.
+    Версия живет в памяти процесса, поэтому в ETag есть id процесса:
+    другой воркер просто отдаст 200, а не ложный 304.
+    """
+    def __init__(self, name: str, maxsize: int = 512, ttl: float = 3600):
+        self.name = name
+        self.version = 0
+        self.instance = uuid.uuid4().hex[:8]
+        self._cache = TTLCache(maxsize=maxsize, ttl=ttl)
+
+    def bump(self) -> None:
+        self.version += 1
+        self._cache.clear()
+
+    def adopt(self, version: int) -> None:
+        """Принять версию, которую поднял кто-то другой (другой воркер)."""
+        if version != self.version:
+            self.version = version
+            self._cache.clear()
+
+    @staticmethod
+    def key_hash(key: Hashable) -> int:
+        return zlib.crc32(repr(key).encode())
+
+    def etag(self, key: Hashable) -> str:
+        return f'W/"{self.name}-{self.instance}-{self.version}-{self.key_hash(key):x}"'
+
+    def get(self, key: Hashable) -> Any:
+        return self._cache.get(key)
+
+    def set(self, key: Hashable, value: Any, version: int | None = None) -> None:
+        """
+        version - версия, при которой начали загружать value. Если за время загрузки
+        версия сменилась (bump или adopt), снимок мог устареть - не кладем его под новой версией.
+        """
+        if version is not None and version != self.version:
+            return
+        self._cache.set(key, value)
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    """Проверка заголовка If-None-Match (может быть список через запятую или '*')."""
+    if not if_none_match:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in candidates or etag in candidates
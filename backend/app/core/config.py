@@ -7,6 +7,53 @@ class Settings(BaseSettings):
     ALGORITHM: str
     ACCESS_TOKEN_EXPIRE_MINUTES: int
 
+    # Кэш авторизованных пользователей (чтобы не ходить в БД на каждый запрос)
+    AUTH_CACHE_TTL_SECONDS: int = 60
+    AUTH_CACHE_MAX_SIZE: int = 1024
+
+    # Пул потоков для bcrypt (хеширование не блокирует event loop)
+    PASSWORD_HASH_WORKERS: int = 4
+    PASSWORD_HASH_MAX_QUEUE: int = 64
+
+    # Пул процессов для Excel (сборка отчетов, разбор импорта); 0 = в потоке, без процессов
+    EXCEL_WORKERS: int = 2
+    EXCEL_MAX_QUEUE: int = 8
+
+    # Профиль подключения к БД (пул соединений)
+    DB_ECHO: bool = False                        # Логировать каждый SQL (только для отладки!)
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: int = 30                    # Сек. ожидания свободного соединения
+    DB_POOL_RECYCLE: int = 1800                  # Пересоздавать соединение раз в N сек.
+    DB_POOL_PRE_PING: bool = True                # Проверять соединение перед выдачей (Neon их закрывает)
+    DB_STATEMENT_CACHE_SIZE: int | None = None   # Кэш asyncpg; None = 0 для "-pooler" хостов, иначе 100
+
+    # Реплика для чтения: отчеты, матрица оценок, расписание и списки (None = все с основной БД)
+    DATABASE_REPLICA_URL: str | None = None
+    # После записи клиент READ_PRIMARY_AFTER_WRITE_SECONDS сек. читает с основной БД (отставание реплики)
+    READ_PRIMARY_AFTER_WRITE_SECONDS: int = 5
+
+    # Фоновые задачи (большие отчеты и импорт)
+    JOB_WORKERS: int = 2
+    JOB_QUEUE_SIZE: int = 100
+    JOB_RESULT_TTL_SECONDS: int = 3600
+
+    # Кэш справочников и расписания: как часто воркер сверяет версию кэша с БД
+    CACHE_VERSION_CHECK_SECONDS: float = 2.0
+
+    # /system/metrics (Prometheus): без токена - только для админа
+    METRICS_TOKEN: str | None = None
+
+    # Проверка схемы при старте: fail - не стартовать, warn - предупредить, off - не проверять
+    # (пустая SQLite создается сама; БД без alembic_version не стартует и при warn)
+    STARTUP_SCHEMA_CHECK: str = "fail"
+
+    # Аудит SQL для разработки: N+1, медленные запросы + EXPLAIN (JSON-строки в файл)
+    QUERY_AUDIT_ENABLED: bool = False
+    QUERY_AUDIT_LOG: str = "query_audit.jsonl"
+    QUERY_AUDIT_REPEAT_THRESHOLD: int = 10 # Одна форма запроса >= N раз за HTTP-запрос
+    QUERY_AUDIT_SLOW_MS: float = 100.0
+
     class Config:
         env_file = ".env"
 
@@ -0,0 +1,172 @@
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from threading import Lock
+from sqlalchemy import event
+
+# Границы корзин гистограмм (как у prometheus_client по умолчанию)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+class RequestDbStats:
+    """SQL-запросы текущего HTTP-запроса (сколько и сколько времени)."""
+    __slots__ = ("statements", "seconds")
+
+    def __init__(self):
+        self.statements = 0
+        self.seconds = 0.0
+
+# Статистика текущего запроса; None - SQL выполняется вне HTTP-запроса (фоновая задача, старт)
+request_db_stats: ContextVar[RequestDbStats | None] = ContextVar("request_db_stats", default=None)
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1) # Последняя корзина - +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+class MetricsRegistry:
+    """
+    Метрики HTTP и БД в памяти процесса, отдаются в текстовом формате Prometheus.
+    Метка route - шаблон пути (/students/{student_id}), а не сам URL,
+    чтобы число серий не росло от id в адресе.
+    """
+    def __init__(self):
+        self._lock = Lock()
+        self.in_flight = 0
+        self.requests = {}     # (method, route, status) -> count
+        self.latency = {}      # (method, route) -> Histogram
+        self.db_statements = {} # (method, route) -> Histogram (запросов на HTTP-запрос)
+        self.db_seconds = {}   # (method, route) -> суммарное время SQL
+        self.db_outside_requests = RequestDbStats()
+
+    def observe_request(self, method: str, route: str, status: int, seconds: float, db: RequestDbStats):
+        key = (method, route)
+        with self._lock:
+            self.requests[(method, route, status)] = self.requests.get((method, route, status), 0) + 1
+            self.latency.setdefault(key, Histogram(LATENCY_BUCKETS)).observe(seconds)
+            self.db_statements.setdefault(key, Histogram(QUERY_COUNT_BUCKETS)).observe(db.statements)
+            self.db_seconds[key] = self.db_seconds.get(key, 0.0) + db.seconds
+
+    def render(self) -> str:
+        """Текстовый формат Prometheus (text/plain; version=0.0.4)."""
+        lines = []
+        with self._lock:
+            lines += [
+                "# HELP http_requests_in_flight Requests currently being processed.",
+                "# TYPE http_requests_in_flight gauge",
+                f"http_requests_in_flight {self.in_flight}",
+                "# HELP http_requests_total Finished requests by route and status.",
+                "# TYPE http_requests_total counter",
+            ]
+            for (method, route, status), count in sorted(self.requests.items()):
+                lines.append(f'http_requests_total{{method="{method}",route="{route}",status="{status}"}} {count}')
+
+            lines += render_histograms(
+                "http_request_duration_seconds", "Request latency by route.", self.latency
+            )
+            lines += render_histograms(
+                "db_statements_per_request", "SQL statements executed per request.", self.db_statements
+            )
+            lines += [
+                "# HELP db_statement_seconds_total Time spent in SQL statements by route.",
+                "# TYPE db_statement_seconds_total counter",
+            ]
+            for (method, route), seconds in sorted(self.db_seconds.items()):
+                lines.append(f'db_statement_seconds_total{{method="{method}",route="{route}"}} {seconds:.6f}')
+            lines += [
+                "# HELP db_statements_outside_requests_total SQL statements outside HTTP requests (jobs, startup).",
+                "# TYPE db_statements_outside_requests_total counter",
+                f"db_statements_outside_requests_total {self.db_outside_requests.statements}",
+            ]
+        return "\n".join(lines) + "\n"
+
+def render_histograms(name: str, help_text: str, histograms: dict) -> list[str]:
+    lines = [f"# HELP {name} {help_text}", f"# TYPE {name} histogram"]
+    for (method, route), hist in sorted(histograms.items()):
+        labels = f'method="{method}",route="{route}"'
+        cumulative = 0
+        for bound, count in zip((*hist.buckets, "+Inf"), hist.counts):
+            cumulative += count
+            lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+        lines.append(f"{name}_sum{{{labels}}} {hist.sum:.6f}")
+        lines.append(f"{name}_count{{{labels}}} {hist.count}")
+    return lines
+
+metrics = MetricsRegistry()
+
+class MetricsMiddleware:
+    """
+    ASGI middleware: время запроса (включая отдачу потокового тела), статус,
+    число запросов "в полете" и SQL-статистика запроса (через request_db_stats).
+    """
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        status = 500
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        db = RequestDbStats()
+        token = request_db_stats.set(db)
+        metrics.in_flight += 1
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            metrics.in_flight -= 1
+            request_db_stats.reset(token)
+            metrics.observe_request(scope["method"], route_template(scope), status, time.perf_counter() - started, db)
+
+def route_template(scope) -> str:
+    """
+    Шаблон маршрута с префиксом роутера: /students/{student_id}/transfer.
+    Новые версии FastAPI кладут в scope маршрут без префикса include_router,
+    поэтому префикс восстанавливаем по фактическому пути.
+    """
+    route = scope.get("route")
+    regex = getattr(route, "path_regex", None)
+    if regex is None:
+        return "unmatched"
+    path = scope["path"]
+    for i, ch in enumerate(path):
+        if ch == "/" and regex.match(path[i:]):
+            return path[:i] + route.path
+    return route.path
+
+def instrument_engine(engine) -> None:
+    """Считает SQL-запросы движка через события SQLAlchemy (before/after_cursor_execute)."""
+    sync_engine = engine.sync_engine
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["query_started"].pop()
+        stats = request_db_stats.get() or metrics.db_outside_requests
+        stats.statements += 1
+        stats.seconds += elapsed
+
+    @event.listens_for(sync_engine, "handle_error")
+    def _on_error(exception_context):
+        # Упавший запрос тоже считаем, иначе стек времен старта разъедется
+        conn = exception_context.connection
+        if conn is not None and conn.info.get("query_started"):
+            conn.info["query_started"].pop()
+            stats = request_db_stats.get() or metrics.db_outside_requests
+            stats.statements += 1
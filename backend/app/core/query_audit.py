@@ -0,0 +1,130 @@
+import json
+import logging
+import re
+import time
+import zlib
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from sqlalchemy import event
+
+from app.core.config import settings
+from app.core.metrics import route_template
+
+# Режим разработки: повторяющиеся запросы (N+1), медленные запросы и их планы.
+# Включается QUERY_AUDIT_ENABLED=true, пишет JSON-строки в QUERY_AUDIT_LOG.
+logger = logging.getLogger("app.query_audit")
+
+MAX_PARAMS_LENGTH = 500
+# Списки IN (?, ?, ?) / ($1, $2) разной длины - это один и тот же запрос
+IN_LIST_RE = re.compile(r"\((?:\s*(?:\?|\$\d+|%\([^)]+\)s|:\w+)\s*,)*\s*(?:\?|\$\d+|%\([^)]+\)s|:\w+)\s*\)")
+SPACES_RE = re.compile(r"\s+")
+
+def normalize_statement(statement: str) -> str:
+    """Форма запроса: без переносов строк и с IN-списками любой длины как (...)."""
+    return IN_LIST_RE.sub("(...)", SPACES_RE.sub(" ", statement).strip())
+
+def fingerprint(shape: str) -> str:
+    return f"{zlib.crc32(shape.encode()):08x}"
+
+def short_params(parameters) -> str:
+    text = repr(parameters)
+    return text if len(text) <= MAX_PARAMS_LENGTH else text[:MAX_PARAMS_LENGTH] + "..."
+
+class RequestAudit:
+    """Формы SQL-запросов одного HTTP-запроса: fingerprint -> [кол-во, время, форма]."""
+    def __init__(self, scope):
+        self.scope = scope
+        self.shapes: dict[str, list] = {}
+
+    @property
+    def route(self) -> str:
+        return route_template(self.scope)
+
+request_audit: ContextVar[RequestAudit | None] = ContextVar("request_audit", default=None)
+
+def write_finding(kind: str, **data) -> None:
+    record = {"ts": datetime.now(timezone.utc).isoformat(timespec="seconds"), "kind": kind, **data}
+    logger.warning(json.dumps(record, ensure_ascii=False, default=str))
+
+def explain(connection, statement: str, parameters) -> list[str] | None:
+    """План запроса тем же соединением (EXPLAIN на Postgres, EXPLAIN QUERY PLAN на SQLite)."""
+    if not statement.lstrip().upper().startswith(("SELECT", "WITH")):
+        return None
+    prefix = "EXPLAIN QUERY PLAN " if connection.dialect.name == "sqlite" else "EXPLAIN "
+    try:
+        cursor = connection.connection.cursor()
+        try:
+            cursor.execute(prefix + statement, parameters)
+            return [" | ".join(str(col) for col in row) for row in cursor.fetchall()]
+        finally:
+            cursor.close()
+    except Exception as e: # План - только подсказка, запрос пользователя ломать нельзя
+        return [f"EXPLAIN failed: {e}"]
+
+class QueryAuditMiddleware:
+    """ASGI middleware: после запроса пишет в лог формы SQL, повторенные >= порога раз (N+1)."""
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        audit = RequestAudit(scope)
+        token = request_audit.set(audit)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            request_audit.reset(token)
+            for key, (count, seconds, shape) in audit.shapes.items():
+                if count >= settings.QUERY_AUDIT_REPEAT_THRESHOLD:
+                    write_finding(
+                        "n_plus_one", method=scope["method"], route=audit.route, fingerprint=key,
+                        count=count, total_ms=round(seconds * 1000, 2), statement=shape
+                    )
+
+def setup_query_audit(engine) -> None:
+    """Подключает лог и события движка. Вызывается только при QUERY_AUDIT_ENABLED."""
+    if not logger.handlers:
+        handler = logging.FileHandler(settings.QUERY_AUDIT_LOG, encoding="utf-8")
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        logger.addHandler(handler)
+        logger.propagate = False
+
+    sync_engine = engine.sync_engine
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("audit_started", []).append(time.perf_counter())
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["audit_started"].pop()
+        shape = normalize_statement(statement)
+        key = fingerprint(shape)
+
+        audit = request_audit.get()
+        if audit is not None:
+            acc = audit.shapes.setdefault(key, [0, 0.0, shape])
+            acc[0] += 1
+            acc[1] += elapsed
+
+        if elapsed * 1000 >= settings.QUERY_AUDIT_SLOW_MS:
+            # Потоковый курсор еще читается - второй запрос в то же соединение не шлем
+            streaming = context is not None and context.execution_options.get("stream_results")
+            write_finding(
+                "slow_query",
+                method=audit.scope["method"] if audit else None,
+                route=audit.route if audit else None,
+                fingerprint=key,
+                duration_ms=round(elapsed * 1000, 2),
+                statement=shape,
+                params=short_params(parameters),
+                plan=None if executemany or streaming else explain(conn, statement, parameters),
+            )
+
+    @event.listens_for(sync_engine, "handle_error")
+    def _on_error(exception_context):
+        conn = exception_context.connection
+        if conn is not None and conn.info.get("audit_started"):
+            conn.info["audit_started"].pop()
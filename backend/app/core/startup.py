@@ -0,0 +1,51 @@
+import time
+
+# Модуль импортируется первым в app.main - отсюда считаем время импорта приложения
+IMPORT_STARTED = time.perf_counter()
+
+class StartupReport:
+    """
+    Из чего складывается холодный старт: импорт модулей, подключение к БД,
+    проверка схемы и первый запрос. Печатается в лог после первого ответа
+    и доступен в /system/startup.
+    """
+    def __init__(self):
+        self.phases: dict[str, float] = {}
+        self.details: dict = {}
+        self.first_request: str | None = None
+
+    def mark(self, phase: str, seconds: float) -> None:
+        self.phases[phase] = seconds
+
+    def as_dict(self) -> dict:
+        return {
+            "phases_ms": {phase: round(seconds * 1000, 1) for phase, seconds in self.phases.items()},
+            "total_ms": round(sum(self.phases.values()) * 1000, 1),
+            "first_request": self.first_request,
+            **self.details,
+        }
+
+    def log(self) -> None:
+        parts = ", ".join(f"{phase} {seconds * 1000:.0f}мс" for phase, seconds in self.phases.items())
+        print(f">>> ⏱️ ХОЛОДНЫЙ СТАРТ: {parts} (итого {sum(self.phases.values()) * 1000:.0f}мс)")
+
+startup_report = StartupReport()
+
+class StartupTimingMiddleware:
+    """Замеряет только первый запрос процесса, дальше - просто пропускает."""
+    def __init__(self, app):
+        self.app = app
+        self.done = False
+
+    async def __call__(self, scope, receive, send):
+        if self.done or scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        self.done = True
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            startup_report.mark("first_request", time.perf_counter() - started)
+            startup_report.first_request = f"{scope['method']} {scope['path']}"
+            startup_report.log()
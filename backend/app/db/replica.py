@@ -0,0 +1,52 @@
+from fastapi import Request
+
+from app.core.config import settings
+from app.db.session import AsyncSessionLocal, ReadSessionLocal, replica_engine
+
+# Кука "недавно писал": пока она жива, чтения клиента идут на основную БД
+READ_PRIMARY_COOKIE = "read_primary"
+# Явная просьба клиента прочитать с основной БД (например, сразу после импорта)
+READ_PRIMARY_HEADER = "x-read-primary"
+READ_METHODS = {"GET", "HEAD", "OPTIONS"}
+
+def wants_primary(request: Request) -> bool:
+    return (
+        replica_engine is None
+        or READ_PRIMARY_COOKIE in request.cookies
+        or request.headers.get(READ_PRIMARY_HEADER, "").lower() in ("1", "true")
+    )
+
+async def get_read_db(request: Request):
+    """
+    Сессия для эндпоинтов, которые только читают: реплика, если она настроена.
+    Клиент, который только что писал, читает с основной БД (read-your-writes).
+    Эндпоинты с cached_json_response остаются на get_db: версия кэша поднимается на основной БД,
+    и снимок, загруженный с отстающей реплики, закэшировался бы под новой версией.
+    """
+    session_factory = AsyncSessionLocal if wants_primary(request) else ReadSessionLocal
+    async with session_factory() as session:
+        yield session
+
+class ReadYourWritesMiddleware:
+    """
+    ASGI middleware: после успешного изменяющего запроса ставит короткую куку read_primary,
+    чтобы следующие READ_PRIMARY_AFTER_WRITE_SECONDS сек. клиент не видел отставание реплики.
+    Подключается только при заданном DATABASE_REPLICA_URL.
+    """
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] in READ_METHODS:
+            return await self.app(scope, receive, send)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start" and message["status"] < 400:
+                cookie = (
+                    f"{READ_PRIMARY_COOKIE}=1; Max-Age={settings.READ_PRIMARY_AFTER_WRITE_SECONDS}; "
+                    "Path=/; HttpOnly; SameSite=Lax"
+                )
+                message["headers"] = [*message.get("headers", []), (b"set-cookie", cookie.encode())]
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
@@ -0,0 +1,99 @@
+import re
+import time
+from pathlib import Path
+from sqlalchemy import inspect, text
+
+from app.core.config import settings
+from app.db.base import Base
+
+VERSIONS_DIR = Path(__file__).resolve().parents[2] / "alembic" / "versions"
+REVISION_RE = re.compile(r"^revision\s*(?::[^=]*)?=\s*['\"](\w+)['\"]", re.M)
+DOWN_REVISION_RE = re.compile(r"^down_revision\s*(?::[^=]*)?=\s*(.+)$", re.M)
+# Последняя миграция на момент, когда таблицы создавал create_all при старте:
+# БД того времени соответствуют ей, но alembic_version в них нет
+LEGACY_BASELINE_REVISION = "7499ad797df3"
+
+class SchemaOutdated(RuntimeError):
+    """Ревизия БД не совпадает с последней миграцией."""
+
+def alembic_heads(versions_dir: Path = VERSIONS_DIR) -> set[str]:
+    """
+    Последние ревизии (heads) по файлам миграций.
+    Читаем файлы сами, без импорта alembic: он добавляет ~0.5с к холодному старту.
+    """
+    revisions, parents = set(), set()
+    for path in versions_dir.glob("*.py"):
+        source = path.read_text(encoding="utf-8")
+        revision = REVISION_RE.search(source)
+        if not revision:
+            continue
+        revisions.add(revision.group(1))
+        down = DOWN_REVISION_RE.search(source)
+        if down:
+            parents.update(re.findall(r"['\"](\w+)['\"]", down.group(1)))
+    return revisions - parents
+
+def read_db_state(sync_conn) -> tuple[set[str], bool]:
+    """(ревизии из alembic_version, есть ли в БД вообще таблицы)."""
+    tables = set(inspect(sync_conn).get_table_names())
+    if "alembic_version" not in tables:
+        return set(), bool(tables)
+    rows = sync_conn.execute(text("SELECT version_num FROM alembic_version"))
+    return {row[0] for row in rows}, True
+
+def create_and_stamp(sync_conn, heads: set[str]) -> None:
+    """Пустая SQLite (локальная разработка): создаем таблицы и помечаем их последней ревизией."""
+    Base.metadata.create_all(sync_conn)
+    sync_conn.execute(text(
+        "CREATE TABLE IF NOT EXISTS alembic_version (version_num VARCHAR(32) NOT NULL PRIMARY KEY)"
+    ))
+    for head in heads:
+        sync_conn.execute(text("INSERT INTO alembic_version (version_num) VALUES (:v)"), {"v": head})
+
+async def check_schema(engine) -> dict:
+    """
+    Вместо create_all на каждом старте: сверяем alembic_version с последней миграцией.
+    STARTUP_SCHEMA_CHECK: fail - не стартуем, warn - предупреждение в лог, off - не проверяем.
+    БД от create_all (таблицы есть, ревизии нет) не стартует и в режиме warn:
+    в ней нет новых таблиц и уникальных индексов, и любая запись упала бы с 500.
+    Возвращает тайминги (подключение к БД, проверка) и результат.
+    """
+    result = {"mode": settings.STARTUP_SCHEMA_CHECK}
+    started = time.perf_counter()
+    async with engine.connect() as conn:
+        result["db_connect_seconds"] = time.perf_counter() - started
+        if settings.STARTUP_SCHEMA_CHECK == "off":
+            return result
+
+        checked = time.perf_counter()
+        heads = alembic_heads()
+        current, has_tables = await conn.run_sync(read_db_state)
+
+        if not has_tables and conn.dialect.name == "sqlite":
+            await conn.run_sync(create_and_stamp, heads)
+            await conn.commit()
+            current = heads
+            result["created"] = True
+
+        result.update(
+            schema_check_seconds=time.perf_counter() - checked,
+            db_revision=sorted(current),
+            head_revision=sorted(heads),
+            up_to_date=current == heads,
+        )
+
+    if has_tables and not current:
+        raise SchemaOutdated(
+            "В БД есть таблицы, но нет alembic_version (создана через create_all). "
+            f"Пометьте ее базовой ревизией и обновите: "
+            f"alembic stamp {LEGACY_BASELINE_REVISION} && alembic upgrade head"
+        )
+    if not result["up_to_date"]:
+        message = (
+            f"Схема БД ({', '.join(sorted(current)) or 'без ревизии'}) не совпадает с миграциями "
+            f"({', '.join(sorted(heads))}). Выполните: alembic upgrade head"
+        )
+        if settings.STARTUP_SCHEMA_CHECK == "fail":
+            raise SchemaOutdated(message)
+        print(f">>> ⚠️ {message}")
+    return result
@@ -1,49 +1,185 @@
 import os
+import time
+from sqlalchemy import event, exc
+from sqlalchemy.engine import make_url
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+from app.core.config import settings
+
+# Параметры URL, которые asyncpg понимает только через connect_args
+SSL_QUERY_PARAMS = ("sslmode", "ssl")
 
 # 1. Получаем переменную
 raw_url = os.getenv("DATABASE_URL")
 
-if not raw_url:
-    print("WARNING: DATABASE_URL not found, using sqlite.")
-    DATABASE_URL = "sqlite+aiosqlite:///./school.db"
-    connect_args = {"check_same_thread": False}
-else:
+def build_engine_profile(raw_url: str | None) -> tuple[str, dict, dict]:
+    """
+    Возвращает (url, connect_args, engine_kwargs) для create_async_engine.
+    Все настройки пула берутся из app.core.config (переменные окружения DB_*).
+    """
+    if not raw_url:
+        print("WARNING: DATABASE_URL not found, using sqlite.")
+        return "sqlite+aiosqlite:///./school.db", {"check_same_thread": False}, {}
+
     # 2. ЧИСТКА ОТ МУСОРА
     # Удаляем пробелы, кавычки
-    DATABASE_URL = raw_url.strip().replace('"', '').replace("'", "")
-    
-    # !!! ВАЖНОЕ ИСПРАВЛЕНИЕ !!!
-    # Драйвер asyncpg не понимает параметры типа ?sslmode=require
-    # Мы просто отрезаем всё, что идет после знака вопроса
-    if "?" in DATABASE_URL:
-        DATABASE_URL = DATABASE_URL.split("?")[0]
+    database_url = raw_url.strip().replace('"', '').replace("'", "")
 
     # 3. Исправляем префикс
-    if DATABASE_URL.startswith("postgres://"):
-        DATABASE_URL = DATABASE_URL.replace("postgres://", "postgresql+asyncpg://", 1)
-    elif DATABASE_URL.startswith("postgresql://"):
-        DATABASE_URL = DATABASE_URL.replace("postgresql://", "postgresql+asyncpg://", 1)
-    
-    # Для Postgres аргументы не нужны (Neon сам разберется с SSL)
+    if database_url.startswith("postgres://"):
+        database_url = database_url.replace("postgres://", "postgresql+asyncpg://", 1)
+    elif database_url.startswith("postgresql://"):
+        database_url = database_url.replace("postgresql://", "postgresql+asyncpg://", 1)
+
+    url = make_url(database_url)
+    if url.get_backend_name() != "postgresql":
+        return url.render_as_string(hide_password=False), {}, {}
+
+    # 4. SSL: asyncpg не понимает ?sslmode=require в URL, передаем его через connect_args.
+    # Остальные параметры libpq (channel_binding и т.п.) asyncpg не знает - отбрасываем.
     connect_args = {}
+    ssl = next((url.query[p] for p in SSL_QUERY_PARAMS if p in url.query), None)
+    if isinstance(ssl, tuple):
+        ssl = ssl[-1]
+    if ssl and ssl != "disable":
+        connect_args["ssl"] = ssl
+
+    # 5. Кэш prepared statements asyncpg.
+    # Пулер (pgbouncer, Neon "-pooler") в режиме транзакций ломает prepared statements -> кэш 0.
+    statement_cache_size = settings.DB_STATEMENT_CACHE_SIZE
+    if statement_cache_size is None:
+        statement_cache_size = 0 if "pooler" in (url.host or "") else 100
+    connect_args["statement_cache_size"] = statement_cache_size
+    url = url.set(query={"prepared_statement_cache_size": str(statement_cache_size)})
+
+    engine_kwargs = {
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+    }
+    return url.render_as_string(hide_password=False), connect_args, engine_kwargs
+
+class PoolStats:
+    """Счетчики пула соединений: сколько выдано, сколько ждали, сколько сверх лимита."""
+    def __init__(self):
+        self.checkouts = 0
+        self.connects = 0
+        self.invalidated = 0
+        self.total_wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+        self.timeouts = 0
+        self.connect_errors = 0
+        self.max_overflow = None # Из настроек движка (у пула это приватный атрибут)
+
+    def record_wait(self, seconds: float):
+        self.total_wait_seconds += seconds
+        self.max_wait_seconds = max(self.max_wait_seconds, seconds)
+
+    def snapshot(self, pool) -> dict:
+        data = {
+            "pool_class": type(pool).__name__,
+            "checkouts": self.checkouts,
+            "connects": self.connects,
+            "invalidated": self.invalidated,
+            "timeouts": self.timeouts,
+            "connect_errors": self.connect_errors,
+            "avg_wait_ms": round(self.total_wait_seconds / self.checkouts * 1000, 3) if self.checkouts else 0,
+            "max_wait_ms": round(self.max_wait_seconds * 1000, 3),
+        }
+        if isinstance(pool, QueuePool):
+            data.update({
+                "size": pool.size(),
+                "checked_out": pool.checkedout(),
+                "checked_in": pool.checkedin(),
+                "overflow": max(pool.overflow(), 0),
+            })
+            if self.max_overflow is not None:
+                data["max_overflow"] = self.max_overflow
+        return data
+
+pool_stats = PoolStats()
 
-# 4. Создаем движок
-try:
-    engine = create_async_engine(DATABASE_URL, echo=True, connect_args=connect_args)
-except Exception as e:
-    print(f"CRITICAL ERROR: Could not parse URL: {DATABASE_URL}")
-    raise e
-
-AsyncSessionLocal = sessionmaker(
-    bind=engine,
-    class_=AsyncSession,
-    expire_on_commit=False,
-    autocommit=False,
-    autoflush=False,
+class MeteredQueuePool(AsyncAdaptedQueuePool):
+    """Обычный пул SQLAlchemy + замер времени ожидания свободного соединения."""
+    stats = pool_stats
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        except exc.TimeoutError: # Пул исчерпан: ждали свободное соединение дольше pool_timeout
+            self.stats.timeouts += 1
+            raise
+        except Exception: # БД недоступна, ошибка авторизации и т.п. - пул тут ни при чем
+            self.stats.connect_errors += 1
+            raise
+        finally:
+            self.stats.record_wait(time.perf_counter() - started)
+
+def create_metered_engine(database_url: str, connect_args: dict, engine_kwargs: dict, stats: PoolStats):
+    """
+    Движок, который пишет счетчики пула в stats (отдельные для основной БД и реплики).
+    Время ожидания соединения меряем только у Postgres (MeteredQueuePool);
+    SQLite остается со своим пулом по умолчанию (для :memory: это StaticPool, а не очередь).
+    """
+    pool_kwargs = {}
+    if make_url(database_url).get_backend_name() != "sqlite":
+        pool_kwargs["poolclass"] = type("MeteredQueuePool", (MeteredQueuePool,), {"stats": stats})
+    stats.max_overflow = engine_kwargs.get("max_overflow")
+
+    # 6. Создаем движок (SQL в лог только если DB_ECHO=true - в проде это тормозит)
+    try:
+        new_engine = create_async_engine(
+            database_url,
+            echo=settings.DB_ECHO,
+            connect_args=connect_args,
+            **pool_kwargs,
+            **engine_kwargs
+        )
+    except Exception as e:
+        print(f"CRITICAL ERROR: Could not create engine for: {database_url.split('@')[-1]}") # Без пароля
+        raise e
+
+    @event.listens_for(new_engine.sync_engine.pool, "checkout")
+    def _on_checkout(dbapi_connection, connection_record, connection_proxy):
+        stats.checkouts += 1
+
+    @event.listens_for(new_engine.sync_engine.pool, "connect")
+    def _on_connect(dbapi_connection, connection_record):
+        stats.connects += 1
+
+    @event.listens_for(new_engine.sync_engine.pool, "invalidate")
+    def _on_invalidate(dbapi_connection, connection_record, exception):
+        stats.invalidated += 1
+
+    return new_engine
+
+DATABASE_URL, connect_args, engine_kwargs = build_engine_profile(raw_url)
+engine = create_metered_engine(DATABASE_URL, connect_args, engine_kwargs, pool_stats)
+
+# 7. Реплика для чтения (необязательно). Без DATABASE_REPLICA_URL все читается с основной БД.
+replica_pool_stats = PoolStats()
+replica_engine = (
+    create_metered_engine(*build_engine_profile(settings.DATABASE_REPLICA_URL), replica_pool_stats)
+    if settings.DATABASE_REPLICA_URL else None
 )
 
+def make_sessionmaker(bind):
+    return sessionmaker(
+        bind=bind,
+        class_=AsyncSession,
+        expire_on_commit=False,
+        autocommit=False,
+        autoflush=False,
+    )
+
+AsyncSessionLocal = make_sessionmaker(engine)
+ReadSessionLocal = make_sessionmaker(replica_engine or engine)
+
 async def get_db():
     async with AsyncSessionLocal() as session:
-        yield session
\ No newline at end of file
+        yield session
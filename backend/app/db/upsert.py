@@ -0,0 +1,66 @@
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+def build_upsert(
+    db: AsyncSession,
+    model,
+    rows: list[dict],
+    conflict_columns: list[str],
+    update_columns: list[str],
+    increment_columns: list[str] = ()
+):
+    """
+    INSERT ... ON CONFLICT (conflict_columns) DO UPDATE SET update_columns.
+    increment_columns прибавляются к текущему значению (счетчики: col = col + excluded.col).
+    Работает на Postgres и SQLite (нужен уникальный индекс по conflict_columns).
+    В одном запросе ключи должны быть уникальны - дубликаты убираем заранее.
+    """
+    dialect = db.get_bind().dialect.name
+    insert = postgresql.insert if dialect == "postgresql" else sqlite.insert
+
+    stmt = insert(model).values(rows)
+    set_ = {column: stmt.excluded[column] for column in update_columns}
+    for column in increment_columns:
+        set_[column] = getattr(model, column) + stmt.excluded[column]
+    return stmt.on_conflict_do_update(index_elements=conflict_columns, set_=set_)
+
+async def upsert_with_previous(
+    db: AsyncSession,
+    model,
+    rows: list[dict],
+    conflict_columns: list[str],
+    update_columns: list[str],
+    track_column: str
+) -> dict:
+    """
+    Тот же upsert, но с прежними значениями track_column: {ключ: старое значение}
+    для строк, которые уже были (впервые вставленных в ответе нет) - для сводных счетчиков.
+    SELECT ... FOR UPDATE до записи не блокирует строки, которых еще нет: две параллельные
+    первые записи одной ячейки обе посчитали бы себя новыми. Поэтому сначала
+    INSERT ... ON CONFLICT DO NOTHING RETURNING: что вставилось - точно новое
+    (параллельная вставка того же ключа ждет нашего commit). Остальные строки уже есть:
+    читаем их с FOR UPDATE и обновляем. В SQLite первый INSERT берет блокировку записи на всю БД.
+    """
+    dialect = db.get_bind().dialect.name
+    insert = postgresql.insert if dialect == "postgresql" else sqlite.insert
+    key_attrs = [getattr(model, column) for column in conflict_columns]
+
+    def row_key(row: dict) -> tuple:
+        return tuple(row[column] for column in conflict_columns)
+
+    stmt = insert(model).values(rows).on_conflict_do_nothing(index_elements=conflict_columns).returning(*key_attrs)
+    created = {tuple(key) for key in await db.execute(stmt)}
+    rest = [row for row in rows if row_key(row) not in created]
+    if not rest:
+        return {}
+
+    rest_keys = {row_key(row) for row in rest}
+    res = await db.execute(
+        select(*key_attrs, getattr(model, track_column))
+        .filter(*[attr.in_({key[i] for key in rest_keys}) for i, attr in enumerate(key_attrs)])
+        .with_for_update()
+    )
+    previous = {tuple(row[:-1]): row[-1] for row in res if tuple(row[:-1]) in rest_keys}
+    await db.execute(build_upsert(db, model, rest, conflict_columns, update_columns))
+    return previous
@@ -1,16 +1,27 @@
+from app.core.startup import IMPORT_STARTED, startup_report, StartupTimingMiddleware # Первым: отсюда считаем импорт
+
 import os
+import time
 from fastapi import FastAPI, Request
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import RedirectResponse
+from fastapi.responses import RedirectResponse, JSONResponse
 from fastapi.templating import Jinja2Templates
 
 # 1. Импортируем Базу и Модели
-from app.db.session import engine
-from app.db.base import Base
+from app.db.session import engine, replica_engine
+from app.db.replica import ReadYourWritesMiddleware
+from app.db.schema import check_schema
+from app.core.security import PasswordHasherBusy, password_hasher
+from app.core.config import settings as app_settings
+from app.core.metrics import MetricsMiddleware, instrument_engine
+from app.core.query_audit import QueryAuditMiddleware, setup_query_audit
+from app.services.jobs import job_runner
+from app.services.excel_pool import ExcelPoolBusy, excel_pool
 
-# Импортируем модели, чтобы SQLAlchemy знала о них перед созданием таблиц
+# Импортируем модели, чтобы SQLAlchemy знала о них (нужно для create_all на пустой SQLite)
 from app.models.user import User
 from app.models.school import Student, ClassGroup, Schedule, Grade, Attendance, Subject, BellSchedule
+from app.models.system import CacheVersion
 
 # 2. Импортируем Роутеры (Разделы сайта)
 from app.api import (
@@ -21,10 +32,31 @@ from app.api import (
     grades,     # Оценки
     attendance, # Посещаемость
     reports,    # Отчеты
-    settings    # Настройки (звонки, предметы)
+    settings,   # Настройки (звонки, предметы)
+    system,     # Служебное (состояние пула БД)
+    jobs,       # Фоновые задачи (отчеты, импорт)
+    dashboard   # Стартовые данные панели одним запросом
 )
 
 app = FastAPI(title="School CRM")
+app.add_middleware(StartupTimingMiddleware)
+
+# Метрики: задержки по маршрутам и SQL-запросы на каждый HTTP-запрос (/system/metrics)
+app.add_middleware(MetricsMiddleware)
+instrument_engine(engine)
+if replica_engine is not None:
+    instrument_engine(replica_engine)
+
+# Только для разработки: лог N+1 и медленных запросов с планами (QUERY_AUDIT_ENABLED=true)
+if app_settings.QUERY_AUDIT_ENABLED:
+    app.add_middleware(QueryAuditMiddleware)
+    setup_query_audit(engine)
+    if replica_engine is not None:
+        setup_query_audit(replica_engine)
+
+# Реплика для чтения: после записи клиент несколько секунд читает с основной БД
+if replica_engine is not None:
+    app.add_middleware(ReadYourWritesMiddleware)
 
 # --- 3. Подключаем Статику (CSS, JS) ---
 static_dir = "app/static"
@@ -44,15 +76,50 @@ app.include_router(grades.router, prefix="/grades", tags=["Grades"])
 app.include_router(attendance.router, prefix="/attendance", tags=["Attendance"])
 app.include_router(reports.router, prefix="/reports", tags=["Reports"])
 app.include_router(settings.router, prefix="/settings", tags=["Settings"])
+app.include_router(system.router, prefix="/system", tags=["System"])
+app.include_router(jobs.router, prefix="/jobs", tags=["Jobs"])
+app.include_router(dashboard.router, prefix="/dashboard", tags=["Dashboard"])
+
+# Очередь bcrypt переполнена - просим клиента повторить позже
+@app.exception_handler(PasswordHasherBusy)
+async def password_hasher_busy_handler(request: Request, exc: PasswordHasherBusy):
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "Сервер перегружен, попробуйте войти через пару секунд"},
+        headers={"Retry-After": "2"}
+    )
 
-# --- 6. Создание таблиц при старте ---
+# Пул Excel занят выгрузками/импортом - то же самое
+@app.exception_handler(ExcelPoolBusy)
+async def excel_pool_busy_handler(request: Request, exc: ExcelPoolBusy):
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "Сервер занят обработкой Excel, повторите через несколько секунд"},
+        headers={"Retry-After": "5"}
+    )
+
+# --- 6. Проверка схемы БД при старте ---
+# Не create_all (он отражает все таблицы удаленной БД на каждом холодном старте),
+# а сверка ревизии alembic_version с последней миграцией. Таблицы создает `alembic upgrade head`.
 @app.on_event("startup")
 async def init_tables():
-    print(">>> 🛠️ ПРОВЕРКА БАЗЫ ДАННЫХ: Создание таблиц, если их нет...")
-    async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
+    result = await check_schema(engine)
+    startup_report.mark("db_connect", result.pop("db_connect_seconds"))
+    if "schema_check_seconds" in result:
+        startup_report.mark("schema_check", result.pop("schema_check_seconds"))
+    startup_report.details["schema"] = result
     print(">>> ✅ БАЗА ДАННЫХ ГОТОВА!")
 
+@app.on_event("startup")
+async def start_job_runner():
+    job_runner.start()
+
+@app.on_event("shutdown")
+async def shutdown_workers():
+    password_hasher.shutdown()
+    excel_pool.shutdown()
+    await job_runner.stop()
+
 # --- 7. Страницы (Frontend) ---
 @app.get("/")
 async def root():
@@ -74,4 +141,6 @@ async def dashboard_page(request: Request):
         "request": request,
         "current_user": {"email": "Loading...", "role": "GUEST"}, 
         "users": []
-    })
\ No newline at end of file
+    })
+# Время импорта приложения (все модули и роутеры) - первая строка отчета о холодном старте
+startup_report.mark("import", time.perf_counter() - IMPORT_STARTED)
@@ -1,3 +1,4 @@
 from app.db.base import Base  # <--- ВОТ ЭТОЙ СТРОКИ НЕ ХВАТАЛО
 from app.models.user import User
-from app.models.school import ClassGroup, Student, Attendance
\ No newline at end of file
+from app.models.school import ClassGroup, Student, Attendance
+from app.models.system import CacheVersion
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, Date, Boolean
+from sqlalchemy import Column, Integer, String, ForeignKey, Date, Boolean, Index
 from sqlalchemy.orm import relationship
 from app.db.base import Base # <--- Используем Base
 
@@ -16,7 +16,7 @@ class Student(Base):
 
     id = Column(Integer, primary_key=True, index=True)
     full_name = Column(String, index=True)
-    class_group_id = Column(Integer, ForeignKey("class_groups.id"))
+    class_group_id = Column(Integer, ForeignKey("class_groups.id"), index=True)
 
     class_group = relationship("ClassGroup", back_populates="students")
     grades = relationship("Grade", back_populates="student")
@@ -41,6 +41,28 @@ class Grade(Base):
     student = relationship("Student", back_populates="grades")
     subject = relationship("Subject")
 
+    # Одна оценка на ученика/предмет/день (нужно для ON CONFLICT и быстрых выборок)
+    __table_args__ = (
+        Index("uq_grades_student_subject_date", "student_id", "subject_id", "date", unique=True),
+        # Выгрузка в хранилище (services/extract.py): фильтр по датам и порядок (date, id) - без сортировки
+        Index("ix_grades_date_id", "date", "id"),
+    )
+
+class GradeTotal(Base):
+    """Сумма и количество оценок ученика по предмету за месяц (ведется вместе с grades)."""
+    __tablename__ = "grade_totals"
+
+    id = Column(Integer, primary_key=True, index=True)
+    student_id = Column(Integer, ForeignKey("students.id"))
+    subject_id = Column(Integer, ForeignKey("subjects.id"))
+    month = Column(Date) # Первое число месяца
+    total = Column(Integer, default=0)
+    count = Column(Integer, default=0)
+
+    __table_args__ = (
+        Index("uq_grade_totals_student_subject_month", "student_id", "subject_id", "month", unique=True),
+    )
+
 class Attendance(Base):
     __tablename__ = "attendance"
 
@@ -53,6 +75,26 @@ class Attendance(Base):
     student = relationship("Student", back_populates="attendance")
     teacher = relationship("User")
 
+    # Одна отметка на ученика в день
+    __table_args__ = (
+        Index("uq_attendance_student_date", "student_id", "date", unique=True),
+    )
+
+class AttendanceDaily(Base):
+    """Сколько учеников класса были / отсутствовали / опоздали за день (ведется вместе с attendance)."""
+    __tablename__ = "attendance_daily"
+
+    id = Column(Integer, primary_key=True, index=True)
+    class_group_id = Column(Integer, ForeignKey("class_groups.id"))
+    date = Column(Date)
+    present = Column(Integer, default=0)
+    absent = Column(Integer, default=0)
+    late = Column(Integer, default=0)
+
+    __table_args__ = (
+        Index("uq_attendance_daily_class_date", "class_group_id", "date", unique=True),
+    )
+
 class Schedule(Base):
     __tablename__ = "schedules"
 
@@ -70,6 +112,13 @@ class Schedule(Base):
     subject = relationship("Subject")
     teacher = relationship("User", back_populates="lessons") 
 
+    # Проверки конфликтов: день + (учитель / кабинет / класс) + время
+    __table_args__ = (
+        Index("ix_schedules_day_teacher_start", "day_of_week", "teacher_id", "start_time"),
+        Index("ix_schedules_day_room_start", "day_of_week", "room_number", "start_time"),
+        Index("ix_schedules_day_class_start", "day_of_week", "class_group_id", "start_time"),
+    )
+
 class BellSchedule(Base):
     __tablename__ = "bell_schedules"
 
@@ -90,4 +139,9 @@ class FinalGrade(Base):
     subject_id = Column(Integer, ForeignKey("subjects.id"))
 
     student = relationship("Student")
-    subject = relationship("Subject")
\ No newline at end of file
+    subject = relationship("Subject")
+
+    # Одна итоговая на ученика/предмет/период
+    __table_args__ = (
+        Index("uq_final_grades_student_subject_period", "student_id", "subject_id", "period_name", unique=True),
+    )
\ No newline at end of file
@@ -30,6 +30,12 @@ class StudentResponse(StudentBase):
     
     model_config = ConfigDict(from_attributes=True)
 
+class StudentSearchResult(StudentBase):
+    id: int
+    class_group_id: int | None
+    class_name: str | None
+    score: float # 0..1, насколько ФИО похоже на запрос
+
 class AttendanceBase(BaseModel):
     date: date
     status: str  # "PRESENT", "ABSENT", "LATE"
@@ -43,6 +49,16 @@ class AttendanceResponse(AttendanceBase):
     
     model_config = ConfigDict(from_attributes=True)
 
+# Массовая отметка: весь класс одним запросом
+class AttendanceBulkItem(BaseModel):
+    student_id: int
+    status: str
+
+class AttendanceBulkCreate(BaseModel):
+    class_id: int
+    date: date
+    items: list[AttendanceBulkItem]
+
 # ... (код Attendance был выше) ...
 
 # --- Предметы (Subjects) ---
@@ -76,6 +92,12 @@ class ScheduleCreate(BaseModel):
     subject_id: int
     teacher_id: int # <--- Добавили поле
 
+# Импорт сетки расписания целиком (например, на неделю)
+class ScheduleImport(BaseModel):
+    lessons: list[ScheduleCreate]
+    replace_classes: bool = False # Удалить старые уроки этих классов и залить новые (только если ошибок нет)
+    dry_run: bool = False         # Только проверить, ничего не сохранять
+
 class ScheduleResponse(ScheduleCreate):
     id: int
 
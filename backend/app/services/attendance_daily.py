@@ -0,0 +1,141 @@
+from datetime import date
+from sqlalchemy import case, delete, func
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from app.db.upsert import build_upsert
+from app.models.school import Attendance, AttendanceDaily, ClassGroup, Student
+
+# Статус отметки -> колонка в attendance_daily (прочие статусы не считаются)
+STATUS_COLUMNS = {"PRESENT": "present", "ABSENT": "absent", "LATE": "late"}
+COUNT_COLUMNS = list(STATUS_COLUMNS.values())
+
+async def apply_attendance_changes(db: AsyncSession, changes) -> None:
+    """
+    Обновляет attendance_daily в ТОЙ ЖЕ транзакции, что и отметки (commit делает вызывающий).
+    changes: (class_id, дата, старый статус | None, новый статус | None).
+    Все изменения - одним upsert со счетчиками (col = col + delta).
+    """
+    deltas = {}
+    for class_id, day, old_status, new_status in changes:
+        if class_id is None or old_status == new_status:
+            continue
+        acc = deltas.setdefault((class_id, day), dict.fromkeys(COUNT_COLUMNS, 0))
+        if old_status in STATUS_COLUMNS:
+            acc[STATUS_COLUMNS[old_status]] -= 1
+        if new_status in STATUS_COLUMNS:
+            acc[STATUS_COLUMNS[new_status]] += 1
+
+    rows = [
+        {"class_group_id": class_id, "date": day, **counts}
+        for (class_id, day), counts in deltas.items()
+        if any(counts.values())
+    ]
+    if rows:
+        await db.execute(build_upsert(
+            db, AttendanceDaily, rows, conflict_columns=["class_group_id", "date"], update_columns=[],
+            increment_columns=COUNT_COLUMNS
+        ))
+
+async def move_students_attendance(db: AsyncSession, moves) -> None:
+    """
+    Перевод учеников в другой класс: их отметки переезжают в сводку нового класса.
+    moves: (student_id, старый class_id, новый class_id).
+    """
+    moves = {student_id: (old, new) for student_id, old, new in moves if old != new}
+    if not moves:
+        return
+    res = await db.execute(
+        select(Attendance.student_id, Attendance.date, Attendance.status)
+        .filter(Attendance.student_id.in_(moves.keys()))
+    )
+    changes = []
+    for student_id, day, status in res:
+        old_class, new_class = moves[student_id]
+        changes.append((old_class, day, status, None))
+        changes.append((new_class, day, None, status))
+    await apply_attendance_changes(db, changes)
+
+def raw_daily_query():
+    """Те же счетчики, посчитанные заново из attendance (для пересборки и сверки)."""
+    return select(
+        Student.class_group_id, Attendance.date,
+        *[
+            func.sum(case((Attendance.status == status, 1), else_=0)).label(column)
+            for status, column in STATUS_COLUMNS.items()
+        ]
+    ).join(Student, Student.id == Attendance.student_id).filter(
+        Student.class_group_id.isnot(None), Attendance.status.in_(STATUS_COLUMNS.keys())
+    ).group_by(Student.class_group_id, Attendance.date)
+
+async def rebuild_attendance_daily(db: AsyncSession) -> int:
+    """Пересчитывает attendance_daily с нуля одним INSERT ... SELECT. Возвращает число строк."""
+    await db.execute(delete(AttendanceDaily))
+    await db.execute(AttendanceDaily.__table__.insert().from_select(
+        ["class_group_id", "date", *COUNT_COLUMNS], raw_daily_query()
+    ))
+    await db.commit()
+    res = await db.execute(select(func.count(AttendanceDaily.id)))
+    return res.scalar()
+
+async def check_attendance_daily(db: AsyncSession, limit: int = 100) -> dict:
+    """Сверяет attendance_daily с attendance. Возвращает число расхождений и первые limit из них."""
+    res_raw = await db.execute(raw_daily_query())
+    expected = {(class_id, day): tuple(counts) for class_id, day, *counts in res_raw}
+    res_stored = await db.execute(select(
+        AttendanceDaily.class_group_id, AttendanceDaily.date,
+        *[getattr(AttendanceDaily, column) for column in COUNT_COLUMNS]
+    ))
+    stored = {(class_id, day): tuple(counts) for class_id, day, *counts in res_stored if any(counts)}
+
+    mismatches = []
+    for key in expected.keys() | stored.keys():
+        if expected.get(key) != stored.get(key):
+            mismatches.append({
+                "class_id": key[0], "date": key[1].isoformat(),
+                "expected": expected.get(key), "stored": stored.get(key),
+            })
+    mismatches.sort(key=lambda m: (m["class_id"], m["date"]))
+    return {"checked": len(expected), "mismatches": len(mismatches), "details": mismatches[:limit]}
+
+async def get_attendance_overview(
+    db: AsyncSession,
+    class_ids: list[int] | None,
+    start_date: date,
+    end_date: date
+) -> dict:
+    """
+    Сводка посещаемости из attendance_daily: итого, по дням и по классам.
+    Строк в сводке - классы x учебные дни, а не все отметки за период.
+    """
+    sums = [func.coalesce(func.sum(getattr(AttendanceDaily, c)), 0).label(c) for c in COUNT_COLUMNS]
+    period = [AttendanceDaily.date >= start_date, AttendanceDaily.date <= end_date]
+    if class_ids:
+        period.append(AttendanceDaily.class_group_id.in_(class_ids))
+
+    res_days = await db.execute(
+        select(AttendanceDaily.date, *sums).filter(*period)
+        .group_by(AttendanceDaily.date).order_by(AttendanceDaily.date)
+    )
+    days = [{"date": day.isoformat(), **counts_dict(counts)} for day, *counts in res_days]
+
+    res_classes = await db.execute(
+        select(ClassGroup.id, ClassGroup.name, *sums)
+        .join(AttendanceDaily, AttendanceDaily.class_group_id == ClassGroup.id)
+        .filter(*period)
+        .group_by(ClassGroup.id, ClassGroup.name).order_by(ClassGroup.name)
+    )
+    classes = [
+        {"class_id": class_id, "class_name": name, **counts_dict(counts)}
+        for class_id, name, *counts in res_classes
+    ]
+
+    totals = counts_dict([sum(day[c] for day in days) for c in COUNT_COLUMNS])
+    return {"totals": totals, "days": days, "classes": classes}
+
+def counts_dict(counts) -> dict:
+    """Счетчики + доля присутствия (опоздавшие тоже были на уроке)."""
+    data = dict(zip(COUNT_COLUMNS, (int(c) for c in counts)))
+    marked = sum(data.values())
+    data["attendance_rate"] = round((data["present"] + data["late"]) / marked * 100, 1) if marked else None
+    return data
@@ -0,0 +1,51 @@
+import time
+from typing import Hashable
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from app.core.cache import VersionedCache
+from app.core.config import settings
+from app.db.upsert import build_upsert
+from app.models.system import CacheVersion
+
+class SharedVersionedCache(VersionedCache):
+    """
+    VersionedCache, номер версии которого хранится в БД (таблица cache_versions).
+    Снимки данных по-прежнему в памяти каждого воркера, но версия у всех одна:
+    bump() на одном воркере остальные увидят не позже чем через check_interval секунд.
+    Поэтому ETag одинаковый на всех воркерах и 304 работает при любой балансировке.
+    """
+    def __init__(self, name: str, check_interval: float | None = None, **kwargs):
+        super().__init__(name, **kwargs)
+        self.check_interval = settings.CACHE_VERSION_CHECK_SECONDS if check_interval is None else check_interval
+        self._checked_at = None
+
+    async def sync(self, db: AsyncSession) -> None:
+        """Сверить версию с БД (не чаще раза в check_interval секунд)."""
+        now = time.monotonic()
+        if self._checked_at is not None and now - self._checked_at < self.check_interval:
+            return
+        res = await db.execute(select(CacheVersion.version).filter(CacheVersion.name == self.name))
+        self.adopt(res.scalar() or 0)
+        self._checked_at = now
+
+    async def bump(self, db: AsyncSession) -> None:
+        """
+        Поднять общую версию. Вызывать ПОСЛЕ commit изменений данных,
+        иначе другой воркер может закэшировать старые данные под новой версией.
+        """
+        stmt = build_upsert(
+            db, CacheVersion, [{"name": self.name, "version": 1}],
+            conflict_columns=["name"], update_columns=[], increment_columns=["version"]
+        ).returning(CacheVersion.version)
+        version = (await db.execute(stmt)).scalar_one()
+        await db.commit()
+        self.adopt(version)
+        self._checked_at = time.monotonic()
+
+    def etag(self, key: Hashable) -> str:
+        # Версия общая - id процесса в ETag не нужен
+        return f'W/"{self.name}-{self.version}-{self.key_hash(key):x}"'
+
+# Справочники: классы, предметы, звонки. Меняются редко, читаются на каждом экране.
+reference_cache = SharedVersionedCache("reference")
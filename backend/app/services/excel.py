@@ -0,0 +1,141 @@
+import json
+from datetime import date
+from openpyxl import Workbook, load_workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
+
+# Стили (создаются один раз, а не на каждую ячейку)
+BOLD_FONT = Font(bold=True, color="FFFFFF")
+TITLE_FONT = Font(size=14, bold=True)
+HEADER_FILL = PatternFill(start_color="4F81BD", end_color="4F81BD", fill_type="solid")
+CENTER_ALIGN = Alignment(horizontal="center", vertical="center")
+THIN_BORDER = Border(left=Side(style='thin'), right=Side(style='thin'), top=Side(style='thin'), bottom=Side(style='thin'))
+
+def report_headers(report_type: str) -> list[str]:
+    headers = ["№", "ФИО Ученика"]
+    if report_type == "grades":
+        headers.extend(["Средний балл", "Кол-во оценок"])
+    else:
+        headers.extend(["Пропуски (Н/Б)", "Опоздания"])
+    return headers
+
+def sheet_title(name: str) -> str:
+    """Excel: имя листа до 31 символа и без []:*?/\\"""
+    for ch in '[]:*?/\\':
+        name = name.replace(ch, "_")
+    return name[:31] or "Отчет"
+
+class ReportWorkbookWriter:
+    """
+    Потоковая (write_only) запись отчета в Excel.
+    Строки пишутся сразу во временный файл листа, а не держатся в памяти,
+    поэтому память не растет вместе с размером отчета.
+    Один лист на класс: begin_sheet() -> append_row() ... -> save().
+    """
+    def __init__(self, report_type: str, start_date: date, end_date: date):
+        self.report_type = report_type
+        self.start_date = start_date
+        self.end_date = end_date
+        self.headers = report_headers(report_type)
+        self.wb = Workbook(write_only=True)
+        self.ws = None
+        self.row_idx = 0
+
+    def _cell(self, value, font=None, fill=None, alignment=None, border=None):
+        cell = WriteOnlyCell(self.ws, value=value)
+        if font: cell.font = font
+        if fill: cell.fill = fill
+        if alignment: cell.alignment = alignment
+        if border: cell.border = border
+        return cell
+
+    def begin_sheet(self, class_name: str):
+        self.ws = self.wb.create_sheet(sheet_title(class_name))
+        self.row_idx = 0
+
+        # Ширину колонок в write_only режиме надо задать ДО первой строки
+        self.ws.column_dimensions['A'].width = 5
+        self.ws.column_dimensions['B'].width = 35
+        self.ws.column_dimensions['C'].width = 15
+        self.ws.column_dimensions['D'].width = 15
+
+        # Заголовок
+        report_name = 'Успеваемость' if self.report_type == 'grades' else 'Посещаемость'
+        self.ws.merged_cells.add('A1:D1')
+        self.ws.merged_cells.add('A2:D2')
+        self.ws.append([self._cell(f"Отчет: {report_name} | Класс: {class_name}", font=TITLE_FONT, alignment=CENTER_ALIGN)])
+        self.ws.append([self._cell(f"Период: {self.start_date} — {self.end_date}", alignment=CENTER_ALIGN)])
+        self.ws.append([])
+
+        # Шапка
+        self.ws.append([
+            self._cell(h, font=BOLD_FONT, fill=HEADER_FILL, alignment=CENTER_ALIGN, border=THIN_BORDER)
+            for h in self.headers
+        ])
+
+    def append_row(self, row: dict):
+        self.row_idx += 1
+        values = [self.row_idx, row["full_name"]]
+        if self.report_type == "grades":
+            values.extend([row["value"], row["count"]])
+        else:
+            values.extend([row["absent"], row["late"]])
+        self.ws.append([self._cell(v, border=THIN_BORDER) for v in values])
+
+    def save(self, fileobj):
+        self.wb.save(fileobj)
+
+# --- Функции для процессов ExcelPool (app.services.excel_pool) ---
+# Между процессами ходят только пути к файлам: строки лежат во временном JSON Lines,
+# поэтому память не растет с размером отчета/импорта ни у веб-процесса, ни у процесса пула.
+
+def render_report_file(report_type: str, start_date: date, end_date: date, rows_path: str, output_path: str, empty_sheet_name: str) -> str:
+    """Строки отчета из rows_path (по классам подряд) -> .xlsx в output_path (write_only, потоково)."""
+    writer = ReportWorkbookWriter(report_type, start_date, end_date)
+    current_class, sheets = None, 0
+    with open(rows_path, encoding="utf-8") as rows:
+        for line in rows:
+            row = json.loads(line)
+            if not sheets or row["class_id"] != current_class:
+                current_class = row["class_id"]
+                writer.begin_sheet(row["class_name"])
+                sheets += 1
+            writer.append_row(row)
+    if not sheets:
+        writer.begin_sheet(empty_sheet_name) # Пустой отчет - один пустой лист
+
+    writer.save(output_path)
+    return output_path
+
+def read_roster_file(source_path: str, rows_path: str) -> int:
+    """Excel из source_path (read_only) -> строки parse_roster в rows_path. Возвращает их число."""
+    count = 0
+    with open(rows_path, "w", encoding="utf-8") as rows:
+        for row in parse_roster(source_path):
+            rows.write(json.dumps(row, ensure_ascii=False) + "\n")
+            count += 1
+    return count
+
+# Первая строка с таким текстом в колонке A - заголовок, а не ученик
+ROSTER_HEADER_NAMES = {"фио", "фио ученика", "ученик", "имя", "full_name", "name"}
+
+def parse_roster(fileobj):
+    """
+    Читает Excel потоково (read_only): строка за строкой, без загрузки всего листа.
+    Колонка A - ФИО, колонка B (необязательно) - название класса.
+    Отдает (номер_строки, ФИО, класс | None). Пустые строки пропускаются.
+    """
+    wb = load_workbook(filename=fileobj, read_only=True, data_only=True)
+    try:
+        sheet = wb.active
+        for row_number, row in enumerate(sheet.iter_rows(max_col=2, values_only=True), 1):
+            full_name = str(row[0]).strip() if row and row[0] is not None else ""
+            class_name = str(row[1]).strip() if len(row) > 1 and row[1] is not None else None
+            if not full_name:
+                continue
+            # Строка-заголовок ("ФИО | Класс")
+            if row_number == 1 and full_name.lower() in ROSTER_HEADER_NAMES:
+                continue
+            yield row_number, full_name, class_name or None
+    finally:
+        wb.close()
@@ -0,0 +1,103 @@
+import asyncio
+import json
+import multiprocessing
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+
+from app.core.config import settings
+
+class ExcelPoolBusy(Exception):
+    """Очередь на обработку Excel переполнена (отдаем 503, а не копим задачи)."""
+
+class ExcelPool:
+    """
+    openpyxl - чистый Python и держит GIL: сборка отчета или разбор файла на несколько секунд
+    останавливает все запросы воркера. Поэтому Excel обрабатывается в пуле ПРОЦЕССОВ:
+    туда и обратно уходят только пути к временным файлам (строки - в JSON Lines, результат - .xlsx),
+    так что ни здесь, ни в процессе пула память не растет с размером файла.
+    Процессы запускаются при первой выгрузке, а не при старте приложения.
+    max_workers = 0 - без процессов, в потоке (для маленьких машин и отладки).
+    """
+    def __init__(self, max_workers: int, max_queue: int):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self._executor = None
+        self.in_flight = 0 # Выполняются + ждут в очереди
+        self.completed = 0
+        self.rejected = 0
+        self.total_run_seconds = 0.0
+        self.max_run_seconds = 0.0
+
+    def _get_executor(self):
+        if self._executor is None and self.max_workers > 0:
+            # spawn, а не fork: у родителя уже есть потоки и соединения с БД
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers, mp_context=multiprocessing.get_context("spawn")
+            )
+        return self._executor
+
+    async def run(self, func, *args):
+        if self.in_flight >= max(self.max_workers, 1) + self.max_queue:
+            self.rejected += 1
+            raise ExcelPoolBusy()
+
+        self.in_flight += 1
+        started = time.perf_counter()
+        try:
+            result = await asyncio.get_running_loop().run_in_executor(self._get_executor(), func, *args)
+        finally:
+            self.in_flight -= 1
+
+        elapsed = time.perf_counter() - started
+        self.completed += 1
+        self.total_run_seconds += elapsed
+        self.max_run_seconds = max(self.max_run_seconds, elapsed)
+        return result
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.max_workers,
+            "started": self._executor is not None,
+            "max_queue": self.max_queue,
+            "in_flight": self.in_flight,
+            "queued": max(self.in_flight - self.max_workers, 0),
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "avg_ms": round(self.total_run_seconds / self.completed * 1000, 2) if self.completed else 0,
+            "max_ms": round(self.max_run_seconds * 1000, 2),
+        }
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+excel_pool = ExcelPool(settings.EXCEL_WORKERS, settings.EXCEL_MAX_QUEUE)
+
+def call_excel(name: str, *args):
+    """Выполняется в процессе пула: openpyxl импортируется там, а не в веб-процессе."""
+    from app.services import excel
+    return getattr(excel, name)(*args)
+
+async def render_report_xlsx(report_type: str, start_date: date, end_date: date, rows_path: str, output_path: str, empty_sheet_name: str) -> str:
+    """Строки из rows_path (JSON Lines) -> .xlsx в output_path. Возвращает output_path."""
+    return await excel_pool.run(
+        call_excel, "render_report_file", report_type, start_date, end_date, rows_path, output_path, empty_sheet_name
+    )
+
+async def read_roster_xlsx(source_path: str, rows_path: str) -> int:
+    """Excel из source_path -> строки (номер, ФИО, класс) в rows_path (JSON Lines). Возвращает их число."""
+    return await excel_pool.run(call_excel, "read_roster_file", source_path, rows_path)
+
+def spool_path(suffix: str) -> str:
+    """Путь для временного файла обмена с пулом (удаляет вызывающий)."""
+    with tempfile.NamedTemporaryFile(suffix=suffix, delete=False) as tmp:
+        return tmp.name
+
+def iter_spooled_rows(rows_path: str):
+    """Строки из JSON Lines по одной (для import_roster, который берет их пачками)."""
+    with open(rows_path, encoding="utf-8") as rows:
+        for line in rows:
+            yield tuple(json.loads(line))
@@ -0,0 +1,73 @@
+import csv
+import io
+import json
+from datetime import date
+from sqlalchemy.future import select
+
+from app.db.session import ReadSessionLocal
+from app.models.school import Student, Grade, FinalGrade, Attendance
+
+EXTRACT_BATCH_SIZE = 1000
+EXTRACT_FORMATS = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv; charset=utf-8",
+}
+
+def build_extract_query(dataset: str, start_date: date | None, end_date: date | None, period_name: str | None):
+    """Сырые строки для выгрузки в хранилище (без ORM-объектов, только колонки)."""
+    if dataset == "grades":
+        query = select(
+            Grade.id, Grade.student_id, Student.class_group_id.label("class_id"),
+            Grade.subject_id, Grade.date, Grade.value
+        ).join(Student, Student.id == Grade.student_id)
+        date_column = Grade.date
+    elif dataset == "attendance":
+        query = select(
+            Attendance.id, Attendance.student_id, Student.class_group_id.label("class_id"),
+            Attendance.date, Attendance.status, Attendance.teacher_id
+        ).join(Student, Student.id == Attendance.student_id)
+        date_column = Attendance.date
+    elif dataset == "final_grades":
+        # У итоговых нет даты - фильтруем по периоду
+        query = select(
+            FinalGrade.id, FinalGrade.student_id, Student.class_group_id.label("class_id"),
+            FinalGrade.subject_id, FinalGrade.period_name, FinalGrade.value
+        ).join(Student, Student.id == FinalGrade.student_id)
+        if period_name:
+            query = query.filter(FinalGrade.period_name == period_name)
+        return query.order_by(FinalGrade.id)
+    else:
+        raise ValueError(dataset)
+
+    if start_date:
+        query = query.filter(date_column >= start_date)
+    if end_date:
+        query = query.filter(date_column <= end_date)
+    # grades: индекс ix_grades_date_id, attendance: ix_attendance_date (+ id) - без сортировки всей таблицы
+    return query.order_by(date_column, query.selected_columns.id)
+
+def encode_ndjson(columns: list[str], rows) -> str:
+    return "".join(
+        json.dumps(dict(zip(columns, row)), ensure_ascii=False, default=str) + "\n"
+        for row in rows
+    )
+
+def encode_csv(rows) -> str:
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(rows)
+    return buffer.getvalue()
+
+async def stream_extract(dataset: str, fmt: str, start_date: date | None, end_date: date | None, period_name: str | None):
+    """
+    Потоковая выгрузка: серверный курсор (stream + yield_per), строки уходят клиенту пачками.
+    Память не зависит от объема выгрузки.
+    Своя сессия (с реплики, если она есть): генератор живет дольше, чем обработчик запроса.
+    """
+    query = build_extract_query(dataset, start_date, end_date, period_name)
+    async with ReadSessionLocal() as session:
+        result = await session.stream(query.execution_options(yield_per=EXTRACT_BATCH_SIZE))
+        columns = list(result.keys())
+        if fmt == "csv":
+            yield encode_csv([columns])
+        async for rows in result.partitions():
+            yield encode_csv(rows) if fmt == "csv" else encode_ndjson(columns, rows)
@@ -0,0 +1,110 @@
+from datetime import date, timedelta
+from sqlalchemy import Date, cast, delete, func, literal, or_, and_, union_all
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from app.db.upsert import build_upsert
+from app.models.school import Grade, GradeTotal
+
+TOTAL_KEY = ["student_id", "subject_id", "month"]
+
+def month_start(day: date) -> date:
+    return day.replace(day=1)
+
+def next_month(month: date) -> date:
+    return (month.replace(day=28) + timedelta(days=4)).replace(day=1)
+
+def month_expr(db: AsyncSession, column):
+    """Первое число месяца в SQL (у SQLite и Postgres разные функции)."""
+    if db.get_bind().dialect.name == "postgresql":
+        return cast(func.date_trunc("month", column), Date)
+    return func.date(column, "start of month")
+
+async def apply_grade_changes(db: AsyncSession, changes) -> None:
+    """
+    Обновляет grade_totals в ТОЙ ЖЕ транзакции, что и запись оценок (commit делает вызывающий).
+    changes: (student_id, subject_id, date, старое значение | None, новое значение).
+    Одним upsert: total += разница, count += 1 для новых оценок.
+    """
+    deltas = {}
+    for student_id, subject_id, grade_date, old_value, new_value in changes:
+        key = (student_id, subject_id, month_start(grade_date))
+        acc = deltas.setdefault(key, [0, 0])
+        acc[0] += new_value - (old_value or 0)
+        acc[1] += 0 if old_value is not None else 1
+
+    rows = [
+        {"student_id": s, "subject_id": sub, "month": m, "total": total, "count": count}
+        for (s, sub, m), (total, count) in deltas.items()
+        if total or count
+    ]
+    if rows:
+        await db.execute(build_upsert(
+            db, GradeTotal, rows, conflict_columns=TOTAL_KEY, update_columns=[],
+            increment_columns=["total", "count"]
+        ))
+
+def raw_totals_query(db: AsyncSession):
+    """Те же суммы, посчитанные заново из grades (для пересборки и сверки)."""
+    month = month_expr(db, Grade.date)
+    return select(
+        Grade.student_id, Grade.subject_id, month.label("month"),
+        func.sum(Grade.value).label("total"), func.count(Grade.id).label("count")
+    ).group_by(Grade.student_id, Grade.subject_id, month)
+
+async def rebuild_grade_totals(db: AsyncSession) -> int:
+    """Пересчитывает grade_totals с нуля одним INSERT ... SELECT. Возвращает число строк."""
+    await db.execute(delete(GradeTotal))
+    query = raw_totals_query(db)
+    await db.execute(GradeTotal.__table__.insert().from_select(
+        ["student_id", "subject_id", "month", "total", "count"], query
+    ))
+    await db.commit()
+    res = await db.execute(select(func.count(GradeTotal.id)))
+    return res.scalar()
+
+async def check_grade_totals(db: AsyncSession, limit: int = 100) -> dict:
+    """Сверяет grade_totals с grades. Возвращает число расхождений и первые limit из них."""
+    res_raw = await db.execute(raw_totals_query(db))
+    expected = {
+        (s, sub, date.fromisoformat(str(m)[:10])): (total, count)
+        for s, sub, m, total, count in res_raw
+    }
+    res_stored = await db.execute(select(
+        GradeTotal.student_id, GradeTotal.subject_id, GradeTotal.month, GradeTotal.total, GradeTotal.count
+    ))
+    stored = {(s, sub, m): (total, count) for s, sub, m, total, count in res_stored if total or count}
+
+    mismatches = []
+    for key in expected.keys() | stored.keys():
+        if expected.get(key) != stored.get(key):
+            mismatches.append({
+                "student_id": key[0], "subject_id": key[1], "month": key[2].isoformat(),
+                "expected": expected.get(key), "stored": stored.get(key),
+            })
+    mismatches.sort(key=lambda m: (m["student_id"], m["subject_id"], m["month"]))
+    return {"checked": len(expected), "mismatches": len(mismatches), "details": mismatches[:limit]}
+
+def grade_sums_subquery(start_date: date, end_date: date):
+    """
+    (student_id, subject_id, total, count) за произвольный период:
+    целые месяцы берутся из grade_totals, неполные месяцы по краям - из grades.
+    """
+    first_full = month_start(start_date) if start_date.day == 1 else next_month(start_date)
+    last_full = month_start(end_date + timedelta(days=1)) # Месяц после последнего целого
+
+    if first_full >= last_full:
+        return select(
+            Grade.student_id, Grade.subject_id, Grade.value.label("total"), literal(1).label("count")
+        ).filter(Grade.date >= start_date, Grade.date <= end_date).subquery()
+
+    from_totals = select(
+        GradeTotal.student_id, GradeTotal.subject_id, GradeTotal.total, GradeTotal.count
+    ).filter(GradeTotal.month >= first_full, GradeTotal.month < last_full)
+    from_edges = select(
+        Grade.student_id, Grade.subject_id, Grade.value.label("total"), literal(1).label("count")
+    ).filter(or_(
+        and_(Grade.date >= start_date, Grade.date < first_full),
+        and_(Grade.date >= last_full, Grade.date <= end_date),
+    ))
+    return union_all(from_totals, from_edges).subquery()
@@ -0,0 +1,129 @@
+import asyncio
+import os
+import time
+import traceback
+import uuid
+from typing import Any, Awaitable, Callable
+
+from app.core.config import settings
+
+class JobQueueFull(Exception):
+    """Очередь фоновых задач переполнена."""
+
+class Job:
+    """Одна фоновая задача (отчет, импорт) и ее результат."""
+    def __init__(self, kind: str, owner_id: int, func: Callable[["Job"], Awaitable[Any]]):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.owner_id = owner_id
+        self.func = func
+        self.status = "queued" # queued -> running -> done | failed
+        self.progress = 0      # Сколько строк / учеников уже обработано
+        self.total = None      # Всего (если известно заранее)
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.error = None
+        # Результат: либо JSON (result), либо файл на диске (file_path)
+        self.result = None
+        self.file_path = None
+        self.filename = None
+        self.media_type = None
+
+    def set_progress(self, done: int, total: int | None = None):
+        self.progress = done
+        if total is not None:
+            self.total = total
+
+    def to_dict(self) -> dict:
+        return {
+            "id": self.id,
+            "kind": self.kind,
+            "status": self.status,
+            "progress": self.progress,
+            "total": self.total,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "error": self.error,
+            "has_result": self.status == "done",
+        }
+
+    def cleanup(self):
+        if self.file_path and os.path.exists(self.file_path):
+            os.remove(self.file_path)
+
+class JobRunner:
+    """
+    Очередь фоновых задач внутри процесса: asyncio.Queue + фиксированное число воркеров.
+    Тяжелые отчеты и импорты не держат HTTP-соединение и не конкурируют
+    с обычными запросами больше чем на `workers` задач одновременно.
+    Готовые результаты хранятся result_ttl секунд.
+    """
+    def __init__(self, workers: int, queue_size: int, result_ttl: int):
+        self.workers = workers
+        self.queue_size = queue_size
+        self.result_ttl = result_ttl
+        self.jobs: dict[str, Job] = {}
+        self._queue: asyncio.Queue | None = None
+        self._tasks: list[asyncio.Task] = []
+
+    def start(self):
+        self._queue = asyncio.Queue(maxsize=self.queue_size)
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        for job in self.jobs.values():
+            job.cleanup()
+        self.jobs.clear()
+
+    def submit(self, kind: str, owner_id: int, func: Callable[[Job], Awaitable[Any]]) -> Job:
+        self._expire()
+        job = Job(kind, owner_id, func)
+        try:
+            self._queue.put_nowait(job)
+        except asyncio.QueueFull:
+            raise JobQueueFull()
+        self.jobs[job.id] = job
+        return job
+
+    def get(self, job_id: str) -> Job | None:
+        self._expire()
+        return self.jobs.get(job_id)
+
+    def stats(self) -> dict:
+        statuses = [job.status for job in self.jobs.values()]
+        return {
+            "workers": self.workers,
+            "queue_size": self.queue_size,
+            **{status: statuses.count(status) for status in ("queued", "running", "done", "failed")},
+        }
+
+    def _expire(self):
+        """Удаляем старые готовые задачи вместе с файлами."""
+        deadline = time.time() - self.result_ttl
+        for job_id in [j.id for j in self.jobs.values() if j.finished_at and j.finished_at < deadline]:
+            self.jobs.pop(job_id).cleanup()
+
+    async def _worker(self):
+        while True:
+            job = await self._queue.get()
+            job.status = "running"
+            job.started_at = time.time()
+            try:
+                await job.func(job)
+                job.status = "done"
+            except Exception as e:
+                job.status = "failed"
+                job.error = getattr(e, "detail", None) or str(e) or type(e).__name__
+                traceback.print_exc()
+            finally:
+                job.finished_at = time.time()
+                job.func = None # Отпускаем замыкание (данные запроса)
+                self._queue.task_done()
+
+job_runner = JobRunner(settings.JOB_WORKERS, settings.JOB_QUEUE_SIZE, settings.JOB_RESULT_TTL_SECONDS)
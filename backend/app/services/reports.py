@@ -0,0 +1,128 @@
+import json
+import os
+from datetime import date
+from sqlalchemy import Float, cast, func, case, and_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from app.models.school import Student, Attendance, ClassGroup
+from app.services.grade_totals import grade_sums_subquery
+from app.services.excel_pool import render_report_xlsx, spool_path
+
+REPORT_TYPES = ("grades", "attendance")
+XLSX_MEDIA_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+def build_report_query(class_ids: list[int] | None, start_date: date, end_date: date, report_type: str):
+    """
+    Собирает ОДИН сгруппированный запрос для отчета.
+    class_ids = None -> вся школа, иначе только указанные классы.
+    Строки идут по классам, внутри класса - по ФИО.
+    """
+    base_cols = (
+        Student.id.label("student_id"),
+        Student.full_name,
+        ClassGroup.id.label("class_id"),
+        ClassGroup.name.label("class_name"),
+    )
+
+    if report_type == "grades":
+        # Суммы за целые месяцы - из grade_totals, по краям периода - из grades.
+        # LEFT JOIN, чтобы ученики без оценок тоже попали в отчет (с нулями)
+        sums = grade_sums_subquery(start_date, end_date)
+        total_count = func.coalesce(func.sum(sums.c.count), 0)
+        query = select(
+            *base_cols,
+            func.coalesce(cast(func.sum(sums.c.total), Float) / func.nullif(total_count, 0), 0).label("value"),
+            total_count.label("count"),
+        ).outerjoin(sums, sums.c.student_id == Student.id)
+    else:
+        query = select(
+            *base_cols,
+            func.coalesce(func.sum(case((Attendance.status == "ABSENT", 1), else_=0)), 0).label("absent"),
+            func.coalesce(func.sum(case((Attendance.status == "LATE", 1), else_=0)), 0).label("late"),
+        ).outerjoin(Attendance, and_(
+            Attendance.student_id == Student.id,
+            Attendance.date >= start_date,
+            Attendance.date <= end_date
+        ))
+
+    query = query.join(ClassGroup, ClassGroup.id == Student.class_group_id)
+    if class_ids:
+        query = query.filter(Student.class_group_id.in_(class_ids))
+
+    return query.group_by(
+        Student.id, Student.full_name, ClassGroup.id, ClassGroup.name
+    ).order_by(ClassGroup.name, Student.full_name, Student.id)
+
+def format_report_row(row, report_type: str) -> dict:
+    """Превращает строку результата в словарь (формат как у старого /reports/view)."""
+    data = {
+        "student_id": row.student_id,
+        "full_name": row.full_name,
+        "class_id": row.class_id,
+        "class_name": row.class_name,
+    }
+    if report_type == "grades":
+        data["value"] = round(float(row.value), 2)
+        data["count"] = row.count
+    else:
+        data["absent"] = int(row.absent)
+        data["late"] = int(row.late)
+    return data
+
+async def get_report_data(
+    db: AsyncSession,
+    class_ids: list[int] | None,
+    start_date: date,
+    end_date: date,
+    report_type: str
+) -> list[dict]:
+    """Данные отчета одним запросом (без цикла по ученикам)."""
+    query = build_report_query(class_ids, start_date, end_date, report_type)
+    result = await db.execute(query)
+    return [format_report_row(row, report_type) for row in result]
+
+async def stream_report_rows(
+    db: AsyncSession,
+    class_ids: list[int] | None,
+    start_date: date,
+    end_date: date,
+    report_type: str
+):
+    """
+    То же, что get_report_data, но строки отдаются по мере чтения из БД
+    (серверный курсор), без загрузки всего отчета в память.
+    """
+    query = build_report_query(class_ids, start_date, end_date, report_type)
+    result = await db.stream(query.execution_options(yield_per=500))
+    async for row in result:
+        yield format_report_row(row, report_type)
+
+async def write_report_workbook(
+    db: AsyncSession,
+    class_ids: list[int] | None,
+    start_date: date,
+    end_date: date,
+    report_type: str,
+    empty_sheet_name: str,
+    output_path: str,
+    on_progress=None
+) -> int:
+    """
+    Строки отчета из БД (серверный курсор) пишутся во временный JSON Lines по одной,
+    затем процесс excel_pool потоково (write_only) собирает из него .xlsx в output_path.
+    Память не зависит от размера отчета, event loop не ждет openpyxl. Возвращает число строк.
+    """
+    rows_path = spool_path(".jsonl")
+    try:
+        count = 0
+        with open(rows_path, "w", encoding="utf-8") as rows:
+            async for row in stream_report_rows(db, class_ids, start_date, end_date, report_type):
+                rows.write(json.dumps(row, ensure_ascii=False) + "\n")
+                count += 1
+                if on_progress and count % 500 == 0:
+                    on_progress(count)
+        await render_report_xlsx(report_type, start_date, end_date, rows_path, output_path, empty_sheet_name)
+    finally:
+        os.remove(rows_path)
+    return count
@@ -0,0 +1,91 @@
+from itertools import islice
+from sqlalchemy import insert, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from app.models.school import Student, ClassGroup
+from app.services.attendance_daily import move_students_attendance
+
+IMPORT_BATCH_SIZE = 500
+MAX_REPORTED_ERRORS = 1000
+IMPORT_MODES = ("skip", "merge", "add")
+
+async def import_roster(db: AsyncSession, rows, default_class_id: int | None, mode: str = "skip", on_progress=None) -> dict:
+    """
+    Импорт учеников пачками по IMPORT_BATCH_SIZE строк (bulk INSERT/UPDATE), одна транзакция.
+    mode:
+      skip  - ученик с таким ФИО уже есть в этом классе -> пропускаем;
+      merge - как skip, а если он есть в ДРУГОМ классе (ровно один) -> переводим;
+      add   - добавляем всех подряд (старое поведение).
+    """
+    res_classes = await db.execute(select(ClassGroup.id, ClassGroup.name))
+    class_by_name = {name.strip().lower(): class_id for class_id, name in res_classes}
+
+    report = {"created": 0, "skipped": 0, "merged": 0, "errors": [], "errors_total": 0}
+    seen = set() # (ФИО, класс) уже добавленные в этом файле
+
+    def error(row_number: int, detail: str):
+        report["errors_total"] += 1
+        if len(report["errors"]) < MAX_REPORTED_ERRORS:
+            report["errors"].append({"row": row_number, "detail": detail})
+
+    rows = iter(rows)
+    processed = 0
+    while batch := list(islice(rows, IMPORT_BATCH_SIZE)):
+        # Уже существующие ученики с такими ФИО - один запрос на пачку
+        existing = {}
+        if mode != "add":
+            res = await db.execute(
+                select(Student.id, Student.full_name, Student.class_group_id)
+                .filter(Student.full_name.in_({name for _, name, _ in batch}))
+            )
+            for student_id, full_name, class_id in res:
+                existing.setdefault(full_name, []).append((student_id, class_id))
+
+        inserts, moves = [], []
+        moved_from = {}
+        for row_number, full_name, class_name in batch:
+            if class_name:
+                class_id = class_by_name.get(class_name.lower())
+                if class_id is None:
+                    error(row_number, f"Класс '{class_name}' не найден")
+                    continue
+            elif default_class_id:
+                class_id = default_class_id
+            else:
+                error(row_number, "Не указан класс")
+                continue
+
+            if mode != "add":
+                matches = existing.get(full_name, [])
+                if (full_name, class_id) in seen or any(c == class_id for _, c in matches):
+                    report["skipped"] += 1
+                    continue
+                if mode == "merge" and matches:
+                    if len(matches) > 1:
+                        error(row_number, f"'{full_name}' найден в нескольких классах, перевод невозможен")
+                        continue
+                    student_id, old_class_id = matches[0]
+                    moves.append({"id": student_id, "class_group_id": class_id})
+                    moved_from[student_id] = old_class_id
+                    existing[full_name] = [(student_id, class_id)]
+                    report["merged"] += 1
+                    continue
+
+            seen.add((full_name, class_id))
+            inserts.append({"full_name": full_name, "class_group_id": class_id})
+
+        if inserts:
+            await db.execute(insert(Student), inserts)
+            report["created"] += len(inserts)
+        if moves:
+            await db.execute(update(Student), moves)
+            await move_students_attendance(db, [
+                (move["id"], moved_from[move["id"]], move["class_group_id"]) for move in moves
+            ])
+        processed += len(batch)
+        if on_progress:
+            on_progress(processed)
+
+    await db.commit()
+    return report
@@ -0,0 +1,151 @@
+import asyncio
+import heapq
+import re
+from collections import Counter, defaultdict
+from sqlalchemy import case, func, literal_column, or_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from app.models.school import Student, ClassGroup
+from app.services.cache_versions import SharedVersionedCache
+
+# Доля триграмм запроса, которая должна найтись в ФИО (ниже - не показываем)
+MIN_SCORE = 0.5
+SPACES_RE = re.compile(r"\s+")
+
+def normalize_name(text: str) -> str:
+    """Регистр, ё/е и лишние пробелы не важны (то же выражение - в индексе Postgres)."""
+    return SPACES_RE.sub(" ", text.lower().replace("ё", "е")).strip()
+
+def name_trigrams(word: str, prefix: bool = False) -> set[str]:
+    """
+    Триграммы слова как в pg_trgm: "  иван " -> "  и", " ив", "ива", "ван", "ан ".
+    prefix=True - без пробела в конце, тогда "ив" совпадает с началом "иван".
+    """
+    padded = f"  {word}" if prefix else f"  {word} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+class StudentNameIndex:
+    """
+    Триграммный индекс ФИО в памяти процесса (для SQLite, где нет pg_trgm).
+    Ученики хранятся по алфавиту, в индексе - их позиции, поэтому порядок позиций = порядок ФИО.
+    Поиск: кандидаты - ученики, у которых есть триграммы запроса,
+    оценка - доля триграмм запроса, найденных в ФИО (опечатка теряет 2-3 из них).
+    """
+    def __init__(self, rows):
+        rows = sorted((normalize_name(full_name or ""), student_id, class_id) for student_id, full_name, class_id in rows)
+        self.names = [name for name, _, _ in rows]
+        self.ids = [student_id for _, student_id, _ in rows]
+        self.classes = [class_id for _, _, class_id in rows]
+        self.postings = defaultdict(list) # триграмма -> [позиция], по возрастанию
+        for position, name in enumerate(self.names):
+            grams = set()
+            for word in name.split(" "):
+                grams |= name_trigrams(word)
+            for gram in grams:
+                self.postings[gram].append(position)
+
+    def is_prefix(self, position: int, query: str) -> bool:
+        name = self.names[position]
+        return name.startswith(query) or f" {query}" in name
+
+    def search(self, query: str, limit: int, class_id: int | None = None) -> list[tuple[int, float]]:
+        """Лучшие limit учеников: (id, оценка). Совпадение с началом ФИО или слова - выше."""
+        grams = set()
+        for word in query.split(" "):
+            grams |= name_trigrams(word, prefix=True)
+        if not grams:
+            return []
+
+        if len(query) < 3:
+            # По 1-2 буквам нечеткий поиск бессмыслен - только начало слова, по алфавиту.
+            # Идем по самому короткому списку и останавливаемся на limit совпадениях.
+            shortest = min((self.postings.get(gram, []) for gram in grams), key=len)
+            found = []
+            for position in shortest:
+                if (class_id is None or self.classes[position] == class_id) and self.is_prefix(position, query):
+                    found.append((self.ids[position], 1.0))
+                    if len(found) == limit:
+                        break
+            return found
+
+        hits = Counter()
+        for gram in grams:
+            hits.update(self.postings.get(gram, ()))
+
+        needed = MIN_SCORE * len(grams)
+        ranked = []
+        for position, count in hits.items():
+            if count < needed or (class_id is not None and self.classes[position] != class_id):
+                continue
+            ranked.append((not self.is_prefix(position, query), -count, position))
+        return [
+            (self.ids[position], neg_count / -len(grams))
+            for _, neg_count, position in heapq.nsmallest(limit, ranked)
+        ]
+
+# Индекс для SQLite. Сбрасывается при добавлении, переводе учеников и удалении класса.
+student_index_cache = SharedVersionedCache("students", maxsize=1)
+_index_lock = asyncio.Lock()
+
+async def get_name_index(db: AsyncSession) -> StudentNameIndex:
+    await student_index_cache.sync(db)
+    index = student_index_cache.get("index")
+    if index is None:
+        async with _index_lock: # Два запроса подряд не строят индекс дважды
+            index = student_index_cache.get("index")
+            if index is None:
+                version = student_index_cache.version
+                res = await db.execute(select(Student.id, Student.full_name, Student.class_group_id))
+                # 50k учеников - доли секунды CPU, строим не в event loop
+                index = await asyncio.to_thread(StudentNameIndex, res.all())
+                student_index_cache.set("index", index, version)
+    return index
+
+def escape_like(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+async def search_students_pg(db: AsyncSession, query: str, limit: int, class_id: int | None) -> list[tuple[int, float]]:
+    """Postgres: GIN-индекс pg_trgm по replace(lower(full_name), 'ё', 'е') (миграция add_student_name_trgm)."""
+    # Константы - прямо в SQL, а не параметрами: иначе выражение не совпадет с индексом
+    name = func.replace(func.lower(Student.full_name), literal_column("'ё'"), literal_column("'е'"))
+    pattern = escape_like(query)
+    is_prefix = or_(name.like(f"{pattern}%", escape="\\"), name.like(f"% {pattern}%", escape="\\"))
+    score = func.word_similarity(query, name)
+    stmt = select(Student.id, score).filter(or_(is_prefix, name.op("%>")(query)))
+    if class_id is not None:
+        stmt = stmt.filter(Student.class_group_id == class_id)
+    stmt = stmt.order_by(case((is_prefix, 0), else_=1), score.desc(), name).limit(limit)
+    res = await db.execute(stmt)
+    return [(student_id, float(value)) for student_id, value in res]
+
+async def search_students(db: AsyncSession, query: str, limit: int, class_id: int | None = None) -> list[dict]:
+    """
+    Поиск ученика по всей школе: по началу ФИО/слова и нечеткий (опечатки).
+    Postgres - pg_trgm, иначе - триграммный индекс в памяти. Не больше limit результатов.
+    """
+    query = normalize_name(query)
+    if not query:
+        return []
+    if db.get_bind().dialect.name == "postgresql":
+        ranked = await search_students_pg(db, query, limit, class_id)
+    else:
+        ranked = (await get_name_index(db)).search(query, limit, class_id)
+    if not ranked:
+        return []
+
+    # Свежие ФИО и класс - одним запросом по найденным id
+    res = await db.execute(
+        select(Student.id, Student.full_name, Student.class_group_id, ClassGroup.name)
+        .outerjoin(ClassGroup, ClassGroup.id == Student.class_group_id)
+        .filter(Student.id.in_([student_id for student_id, _ in ranked]))
+    )
+    rows = {row[0]: row for row in res}
+    return [
+        {
+            "id": student_id, "full_name": rows[student_id][1],
+            "class_group_id": rows[student_id][2], "class_name": rows[student_id][3],
+            "score": round(score, 3),
+        }
+        for student_id, score in ranked if student_id in rows
+    ]
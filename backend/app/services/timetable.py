@@ -0,0 +1,71 @@
+import heapq
+from collections import defaultdict
+
+from app.services.cache_versions import SharedVersionedCache
+
+# Ресурсы, которые не могут быть заняты двумя уроками одновременно
+RESOURCES = {
+    "room": ("room_number", "Кабинет {value} уже занят в это время"),
+    "teacher": ("teacher_id", "Учитель {value} уже ведет урок в это время"),
+    "class": ("class_group_id", "У класса {value} уже есть урок в это время"),
+}
+
+def to_minutes(value: str) -> int:
+    """'08:30' -> 510. Бросает ValueError, если формат неверный."""
+    hours, minutes = value.strip().split(":")
+    hours, minutes = int(hours), int(minutes)
+    if not (0 <= hours < 24 and 0 <= minutes < 60):
+        raise ValueError(value)
+    return hours * 60 + minutes
+
+def lesson_interval(lesson) -> tuple[int, int]:
+    """Интервал урока в минутах [start, end). Бросает ValueError при кривом времени."""
+    start, end = to_minutes(lesson.start_time), to_minutes(lesson.end_time)
+    if end <= start:
+        raise ValueError(f"{lesson.start_time}-{lesson.end_time}")
+    return start, end
+
+def overlaps(a: tuple[int, int], b: tuple[int, int]) -> bool:
+    return a[0] < b[1] and b[0] < a[1]
+
+def find_conflicts(lessons: list) -> list[dict]:
+    """
+    Ищет ВСЕ пересечения уроков по кабинету, учителю и классу.
+    lessons - список (key, lesson), где lesson имеет day_of_week, start_time, end_time,
+    room_number, teacher_id, class_group_id; key - любой идентификатор (id из БД или номер строки).
+
+    Для каждого ресурса уроки группируются по (день, ресурс), сортируются по началу
+    и проходятся "заметающей прямой" с кучей активных уроков: O(n log n + число конфликтов).
+    """
+    intervals = {key: lesson_interval(lesson) for key, lesson in lessons}
+    conflicts = []
+
+    for resource, (attr, message) in RESOURCES.items():
+        groups = defaultdict(list)
+        for key, lesson in lessons:
+            value = getattr(lesson, attr)
+            if value is None or value == "":
+                continue
+            groups[(lesson.day_of_week, value)].append(key)
+
+        for (day, value), keys in groups.items():
+            keys.sort(key=lambda k: intervals[k])
+            active = [] # куча (конец, порядковый номер, key)
+            for order, key in enumerate(keys):
+                start, end = intervals[key]
+                while active and active[0][0] <= start:
+                    heapq.heappop(active)
+                for _, _, other in active:
+                    conflicts.append({
+                        "resource": resource,
+                        "day_of_week": day,
+                        "value": value,
+                        "lessons": [other, key],
+                        "detail": message.format(value=value),
+                    })
+                heapq.heappush(active, (end, order, key))
+
+    return conflicts
+
+# Снимки недельной сетки (по классу / учителю / дню). Сбрасываются при любом изменении расписания.
+timetable_cache = SharedVersionedCache("timetable")
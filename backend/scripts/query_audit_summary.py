@@ -0,0 +1,40 @@
+"""
+Сводка лога аудита SQL (QUERY_AUDIT_LOG) для сравнения между релизами.
+
+Запуск (из папки backend):
+    python -m scripts.query_audit_summary query_audit.jsonl > before.tsv
+    ... новый релиз, те же сценарии ...
+    python -m scripts.query_audit_summary query_audit.jsonl > after.tsv
+    diff before.tsv after.tsv
+
+Строка сводки: вид | маршрут | fingerprint | сколько раз найдено | макс. повторов | макс. мс | запрос.
+Время и параметры в сводку не попадают, поэтому diff показывает только новые/исчезнувшие проблемы.
+"""
+import argparse
+import json
+
+def summarize(path: str) -> list[tuple]:
+    groups = {}
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            item = json.loads(line)
+            key = (item["kind"], item.get("route") or "-", item["fingerprint"])
+            acc = groups.setdefault(key, {"hits": 0, "count": 0, "ms": 0.0, "statement": item["statement"]})
+            acc["hits"] += 1
+            acc["count"] = max(acc["count"], item.get("count", 1))
+            acc["ms"] = max(acc["ms"], item.get("duration_ms", item.get("total_ms", 0.0)))
+    return [
+        (*key, acc["hits"], acc["count"], round(acc["ms"]), acc["statement"])
+        for key, acc in sorted(groups.items())
+    ]
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("log", help="файл QUERY_AUDIT_LOG")
+    parser.add_argument("--no-timing", action="store_true", help="без колонки мс (для точного diff)")
+    args = parser.parse_args()
+    for kind, route, key, hits, count, ms, statement in summarize(args.log):
+        columns = [kind, route, key, hits, count] + ([] if args.no_timing else [ms]) + [statement]
+        print("\t".join(str(c) for c in columns))
@@ -0,0 +1,49 @@
+"""
+Пересборка и сверка сводных таблиц:
+    grade_totals     - суммы оценок по ученику/предмету/месяцу;
+    attendance_daily - посещаемость по классу/дню.
+
+Запуск (из папки backend, DATABASE_URL как у приложения):
+    python -m scripts.rebuild_rollups                         # пересчитать все с нуля
+    python -m scripts.rebuild_rollups grade_totals            # только одну таблицу
+    python -m scripts.rebuild_rollups --check                 # только сверить с сырыми данными
+
+Код выхода --check: 0 - все сходится, 1 - есть расхождения.
+"""
+import argparse
+import asyncio
+import sys
+
+from app.db.session import AsyncSessionLocal
+from app.services.grade_totals import rebuild_grade_totals, check_grade_totals
+from app.services.attendance_daily import rebuild_attendance_daily, check_attendance_daily
+
+ROLLUPS = {
+    "grade_totals": (rebuild_grade_totals, check_grade_totals),
+    "attendance_daily": (rebuild_attendance_daily, check_attendance_daily),
+}
+
+async def main(tables: list[str], check_only: bool) -> int:
+    failed = False
+    async with AsyncSessionLocal() as db:
+        for table in tables:
+            rebuild, check = ROLLUPS[table]
+            if not check_only:
+                rows = await rebuild(db)
+                print(f"{table} пересобрана: {rows} строк")
+            report = await check(db)
+            print(f"{table}: проверено ключей {report['checked']}, расхождений {report['mismatches']}")
+            for item in report["details"]:
+                print(f"  {item}")
+            failed = failed or bool(report["mismatches"])
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("tables", nargs="*", help=f"какие таблицы: {', '.join(ROLLUPS)} (по умолчанию все)")
+    parser.add_argument("--check", action="store_true", help="только сверка, без пересборки")
+    args = parser.parse_args()
+    unknown = set(args.tables) - set(ROLLUPS)
+    if unknown:
+        parser.error(f"неизвестные таблицы: {', '.join(sorted(unknown))}")
+    sys.exit(asyncio.run(main(args.tables or list(ROLLUPS), args.check)))